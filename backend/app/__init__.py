@@ -12,6 +12,15 @@ load_dotenv()
 db = SQLAlchemy()
 jwt = JWTManager()
 
+def create_missing_indexes(app):
+    """Add indexes declared on models to tables that create_all() left untouched"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except Exception as e:
+                app.logger.warning(f"Could not create index {index.name}: {str(e)}")
+
 def create_app():
     app = Flask(__name__)
     
@@ -22,7 +31,7 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     
     # Initialize CORS
-    CORS(app)
+    CORS(app, expose_headers=['X-Cache', 'X-Next-Cursor'])
     
     # Initialize extensions with app
     db.init_app(app)
@@ -44,5 +53,18 @@ def create_app():
     # Create database tables
     with app.app_context():
         db.create_all()
+
+        # Older rows may hold lowercase or duplicate symbols that the unique indexes would reject
+        from .trading import normalize_symbols, backfill_ledger
+        normalize_symbols()
+        create_missing_indexes(app)
+        backfill_ledger()
+    
+    # Keep quote and history caches warm in the background
+    from .cache_warmer import CacheWarmer, CACHE_WARMER_ENABLED
+    if CACHE_WARMER_ENABLED:
+        warmer = CacheWarmer(app)
+        app.extensions['cache_warmer'] = warmer
+        warmer.start()
     
     return app 
\ No newline at end of file
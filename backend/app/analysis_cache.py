@@ -0,0 +1,62 @@
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from .models import AnalysisResult, db
+from .concurrency import SingleFlight
+from datetime import datetime, timedelta
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', '3600'))
+
+# Identical analyses requested at the same time share one LLM call
+analysis_flight = SingleFlight()
+
+
+def data_hash(data):
+    """Stable hash of the market data snapshot fed to the prompt"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def analysis_fingerprint(symbol, prompt_version, data, model):
+    """Content address of an analysis: same inputs, same fingerprint"""
+    parts = [symbol, prompt_version, data_hash(data), model]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_cached_analysis(fingerprint):
+    """Return the stored response body for fingerprint, or None if missing or expired"""
+    row = AnalysisResult.query.filter(
+        AnalysisResult.fingerprint == fingerprint,
+        AnalysisResult.expires_at > datetime.utcnow()
+    ).first()
+    return json.loads(row.result) if row else None
+
+
+def store_analysis(fingerprint, symbol, model, prompt_version, result, ttl=ANALYSIS_CACHE_TTL):
+    """Persist result under fingerprint, replacing any earlier entry, and prune expired ones"""
+    now = datetime.utcnow()
+    try:
+        db.session.execute(delete(AnalysisResult).where(
+            (AnalysisResult.fingerprint == fingerprint) | (AnalysisResult.expires_at <= now)
+        ))
+        db.session.add(AnalysisResult(
+            fingerprint=fingerprint,
+            symbol=symbol,
+            model=model,
+            prompt_version=prompt_version,
+            result=json.dumps(result),
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        ))
+        db.session.commit()
+    except IntegrityError:
+        # Another worker stored the same analysis first; theirs is just as good
+        db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to cache analysis for {symbol}: {str(e)}")
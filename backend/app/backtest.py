@@ -0,0 +1,234 @@
+from .indicators import rolling_mean, rsi, macd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from itertools import product
+import os
+import time
+import logging
+import threading
+import multiprocessing
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(os.cpu_count() or 1)))
+# Workers must not be forked from the web process, which runs background threads.
+# Under forkserver and spawn every worker re-imports the entry script as __mp_main__,
+# so a script that builds the app at import time must skip that there (see run.py).
+# A worker that dies while starting breaks the pool; sweeps then run in-process and
+# the pool is rebuilt after BACKTEST_POOL_RETRY seconds.
+BACKTEST_START_METHOD = os.getenv(
+    'BACKTEST_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+BACKTEST_POOL_RETRY = float(os.getenv('BACKTEST_POOL_RETRY', '300'))
+
+
+# Strategies map a (symbols, time) close panel to target positions: 1 long, 0 flat.
+# A position decided on bar t's close is held over bar t + 1.
+
+def sma_crossover(close, fast=20, slow=50):
+    """Long while the fast SMA is above the slow one"""
+    with np.errstate(invalid='ignore'):
+        return (rolling_mean(close, fast) > rolling_mean(close, slow)).astype('f8')
+
+
+def rsi_threshold(close, period=14, lower=30, upper=70):
+    """Go long when RSI drops below lower, exit when it rises above upper"""
+    value = rsi(close, period)
+    with np.errstate(invalid='ignore'):
+        entries = value < lower
+        exits = value > upper
+
+    # Each bar holds the most recent signal: index of the last entry vs. the last exit
+    positions = np.arange(close.shape[-1])
+    last_entry = np.maximum.accumulate(np.where(entries, positions, -1), axis=-1)
+    last_exit = np.maximum.accumulate(np.where(exits, positions, -1), axis=-1)
+    return (last_entry > last_exit).astype('f8')
+
+
+def macd_cross(close, fast=12, slow=26, signal=9):
+    """Long while MACD is above its signal line"""
+    line, signal_line = macd(close, fast, slow, signal)
+    with np.errstate(invalid='ignore'):
+        return (line > signal_line).astype('f8')
+
+
+STRATEGIES = {
+    'sma_crossover': (sma_crossover, {'fast': [10, 20, 50], 'slow': [50, 100, 200]}),
+    'rsi_threshold': (rsi_threshold, {'period': [14], 'lower': [20, 30, 40], 'upper': [60, 70, 80]}),
+    'macd_cross': (macd_cross, {'fast': [8, 12], 'slow': [21, 26], 'signal': [9]})
+}
+
+
+def backtest(close, position, cost_bps=0.0):
+    """Per-symbol performance of holding position over close, both shaped (symbols, time)"""
+    close = np.asarray(close, dtype='f8')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bar_returns = np.nan_to_num(close[:, 1:] / close[:, :-1] - 1)
+
+    held = position[:, :-1]
+    turnover = np.abs(np.diff(position, axis=-1, prepend=0.0))[:, :-1]
+    returns = held * bar_returns - turnover * cost_bps / 10000
+
+    equity = np.cumprod(1 + returns, axis=-1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=-1) - 1
+    years = returns.shape[-1] / TRADING_DAYS
+    volatility = returns.std(axis=-1) * np.sqrt(TRADING_DAYS)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, returns.mean(axis=-1) * TRADING_DAYS / volatility, 0.0)
+        cagr = np.where(years > 0, equity[:, -1] ** (1 / years) - 1, 0.0)
+
+    return {
+        'total_return': equity[:, -1] - 1,
+        'cagr': cagr,
+        'volatility': volatility,
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.min(axis=-1),
+        'trades': (np.diff(position, axis=-1) > 0).sum(axis=-1),
+        'exposure': held.mean(axis=-1)
+    }
+
+
+def param_grid(grid):
+    """Expand {name: [values]} into a list of parameter dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in product(*(grid[name] for name in names))]
+
+
+def _valid(strategy, params):
+    # Crossovers need the fast average to actually be faster
+    if 'fast' in params and 'slow' in params and params['fast'] >= params['slow']:
+        return False
+    return not (strategy == 'rsi_threshold' and params['lower'] >= params['upper'])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# monotonic time before which sweeps skip the pool after it broke
+_pool_retry_at = 0.0
+
+
+def _executor(workers):
+    """The process pool shared by every sweep, or None while a broken pool is cooling off"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if time.monotonic() < _pool_retry_at:
+                return None
+            context = multiprocessing.get_context(BACKTEST_START_METHOD)
+            if BACKTEST_START_METHOD == 'forkserver':
+                # Workers fork from a server that has already imported numpy and the strategies
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pool
+
+
+def _discard_executor(executor):
+    global _pool, _pool_retry_at
+    with _pool_lock:
+        if _pool is executor:
+            _pool = None
+            _pool_retry_at = time.monotonic() + BACKTEST_POOL_RETRY
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(strategy, params, cost_bps, closes):
+    fn, _ = STRATEGIES[strategy]
+    metrics = backtest(closes, fn(closes, **params), cost_bps)
+    return params, metrics
+
+
+def _run_shared(name, shape, strategy, params, cost_bps):
+    # The panel lives in shared memory so it isn't pickled once per combination
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return _run(strategy, params, cost_bps, np.ndarray(shape, dtype='f8', buffer=block.buf))
+    finally:
+        block.close()
+
+
+def _run_inline(closes, strategy, combos, cost_bps):
+    return [_run(strategy, params, cost_bps, closes) for params in combos]
+
+
+def _run_pooled(closes, strategy, combos, cost_bps, workers):
+    """Run combos in the pool; returns (results, pooled), falling back to in-process"""
+    executor = _executor(workers)
+    if executor is None:
+        return _run_inline(closes, strategy, combos, cost_bps), False
+
+    block = shared_memory.SharedMemory(create=True, size=max(closes.nbytes, 1))
+    try:
+        np.ndarray(closes.shape, dtype='f8', buffer=block.buf)[...] = closes
+        futures = [
+            executor.submit(_run_shared, block.name, closes.shape, strategy, params, cost_bps)
+            for params in combos
+        ]
+        return [future.result() for future in futures], True
+    except BrokenProcessPool as e:
+        # Usually a worker failing to import the entry script; keep serving in-process
+        logger.error(f"Backtest pool broke, running in-process for {BACKTEST_POOL_RETRY:.0f}s: {str(e)}")
+        _discard_executor(executor)
+    finally:
+        block.close()
+        block.unlink()
+
+    return _run_inline(closes, strategy, combos, cost_bps), False
+
+
+def _summary(params, metrics):
+    return {
+        'params': params,
+        'mean_total_return': float(np.nanmean(metrics['total_return'])),
+        'median_total_return': float(np.nanmedian(metrics['total_return'])),
+        'mean_cagr': float(np.nanmean(metrics['cagr'])),
+        'mean_sharpe': float(np.nanmean(metrics['sharpe'])),
+        'mean_max_drawdown': float(np.nanmean(metrics['max_drawdown'])),
+        'mean_exposure': float(np.nanmean(metrics['exposure'])),
+        'trades': int(np.sum(metrics['trades']))
+    }
+
+
+def sweep(closes, strategy, grid=None, cost_bps=0.0, workers=BACKTEST_WORKERS):
+    """Backtest every parameter combination over the whole panel.
+
+    Combinations run in a long-lived process pool that reads the panel from
+    shared memory, unless there is only one combination or one worker, or the
+    pool is unavailable. Returns a report with one summary per combination,
+    best mean Sharpe first, and the per-symbol metrics of the best combination.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {strategy}')
+    closes = np.ascontiguousarray(closes, dtype='f8')
+    combos = [params for params in param_grid(grid or STRATEGIES[strategy][1]) if _valid(strategy, params)]
+    if not combos:
+        raise ValueError('No valid parameter combinations')
+
+    started = time.perf_counter()
+    if workers <= 1 or len(combos) == 1:
+        results, pooled = _run_inline(closes, strategy, combos, cost_bps), False
+    else:
+        results, pooled = _run_pooled(closes, strategy, combos, cost_bps, workers)
+    elapsed = time.perf_counter() - started
+
+    summaries = sorted((_summary(params, metrics) for params, metrics in results),
+                       key=lambda summary: -summary['mean_sharpe'])
+    best_params = summaries[0]['params']
+    best_metrics = next(metrics for params, metrics in results if params == best_params)
+
+    bars = closes.size * len(combos)
+    return {
+        'strategy': strategy,
+        'combinations': len(combos),
+        'symbols': closes.shape[0],
+        'bars_per_symbol': closes.shape[1],
+        'pooled': pooled,
+        'seconds': round(elapsed, 4),
+        'bars_per_second': round(bars / elapsed) if elapsed > 0 else None,
+        'results': summaries,
+        'best': {'params': best_params, 'metrics': best_metrics}
+    }
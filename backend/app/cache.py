@@ -0,0 +1,222 @@
+from .concurrency import with_app_context, SingleFlight
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Set CACHE_DB_PATH to share cache entries between worker processes
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH')
+
+
+class MemoryBackend:
+    """Process-local storage for cache entries"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteBackend:
+    """Cache storage shared by every process that opens the same SQLite file"""
+
+    def __init__(self, path, namespace):
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                'stored_at REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, stored_at FROM cache_entries WHERE namespace = ? AND key = ?',
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)',
+                (self.namespace, key, json.dumps(value), stored_at)
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            )
+
+
+def make_shared_backend(namespace):
+    """Return the cross-process backend for namespace, or None if not configured"""
+    if not CACHE_DB_PATH:
+        return None
+    return SQLiteBackend(CACHE_DB_PATH, namespace)
+
+
+class TTLCache:
+    """Thread-safe TTL cache that serves stale entries while one background refresh runs.
+
+    Entries younger than ``ttl`` are fresh. Entries older than that but younger
+    than ``ttl + stale_ttl`` are returned immediately while the loader runs once
+    in the background to replace them. Anything older is reloaded inline.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=0, shared_backend=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._local = MemoryBackend()
+        self._shared = shared_backend
+        self._refreshing = set()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'refreshes': 0,
+            'refresh_errors': 0
+        }
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _lookup(self, key):
+        entry = self._local.get(key)
+        # A missing or expired local copy may have been replaced by another process
+        if self._shared is not None and (entry is None or time.time() - entry[1] >= self.ttl):
+            try:
+                shared = self._shared.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache read failed for {self.name}: {str(e)}")
+                shared = None
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                entry = shared
+                self._local.set(key, *entry)
+        return entry
+
+    def get(self, key):
+        """Return the cached value if it is still fresh, otherwise None"""
+        entry = self._lookup(key)
+        if entry is None or time.time() - entry[1] >= self.ttl:
+            return None
+        return entry[0]
+
+    def set(self, key, value):
+        stored_at = time.time()
+        self._local.set(key, value, stored_at)
+        if self._shared is not None:
+            try:
+                self._shared.set(key, value, stored_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache write failed for {self.name}: {str(e)}")
+
+    def delete(self, key):
+        self._local.delete(key)
+        if self._shared is not None:
+            self._shared.delete(key)
+
+    def lookup(self, key, loader):
+        """Return (value, status) without loading inline.
+
+        A 'stale' status schedules a background refresh with loader; a 'miss'
+        status means there is no usable entry and value is None.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self._count('hits')
+                return value, 'hit'
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale')
+                self._refresh_in_background(key, loader)
+                return value, 'stale'
+        return None, 'miss'
+
+    def get_or_load(self, key, loader):
+        """Return (value, status) where status is 'hit', 'stale' or 'miss'"""
+        value, status = self.lookup(key, loader)
+        if status != 'miss':
+            return value, status
+
+        self._count('misses')
+
+        # Concurrent misses for the same key share one load
+        def load():
+            value = loader()
+            self.set(key, value)
+            return value
+
+        return self._flight.do(key, load), 'miss'
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, loader())
+                self._count('refreshes')
+            except Exception as e:
+                self._count('refresh_errors')
+                logger.error(f"Background refresh of {self.name}[{key}] failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=with_app_context(refresh), daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['refreshing'] = len(self._refreshing)
+        lookups = stats['hits'] + stats['stale'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale']) / lookups, 4) if lookups else 0.0
+        stats['coalesced'] = self._flight.coalesced
+        stats['entries'] = len(self._local)
+        stats['ttl'] = self.ttl
+        stats['stale_ttl'] = self.stale_ttl
+        stats['shared'] = self._shared is not None
+        return stats
@@ -0,0 +1,138 @@
+from sqlalchemy import func
+from .models import StockHolding, db
+from .market_data import (
+    refresh_quote, hot_symbols, quote_cache, ohlcv_store, fetch_daily_series, QUOTE_PROVIDER_ORDER, HISTORY_PROVIDER
+)
+from .upstream import upstream
+from datetime import datetime
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CACHE_WARMER_ENABLED = os.getenv('CACHE_WARMER_ENABLED', 'false').lower() == 'true'
+CACHE_WARMER_INTERVAL = float(os.getenv('CACHE_WARMER_INTERVAL', '300'))
+CACHE_WARMER_HOT_SYMBOLS = int(os.getenv('CACHE_WARMER_HOT_SYMBOLS', '20'))
+# Share of each provider's token bucket the warmer may spend; the rest is left for users
+CACHE_WARMER_BUDGET = float(os.getenv('CACHE_WARMER_BUDGET', '0.5'))
+
+# A symbol someone holds outranks one that was merely requested a few times
+HELD_SYMBOL_WEIGHT = 10
+
+
+class CacheWarmer:
+    """Keeps quotes and daily history warm for held and frequently requested symbols"""
+
+    def __init__(self, app, interval=CACHE_WARMER_INTERVAL, hot_count=CACHE_WARMER_HOT_SYMBOLS,
+                 budget=CACHE_WARMER_BUDGET):
+        self.app = app
+        self.interval = interval
+        self.hot_count = hot_count
+        self.budget = budget
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def prioritized_symbols(self):
+        """Return held and hot symbols, highest priority first"""
+        priorities = {}
+
+        held = db.session.query(StockHolding.symbol, func.count(StockHolding.id)).group_by(StockHolding.symbol)
+        for symbol, holders in held:
+            symbol = symbol.upper()
+            priorities[symbol] = priorities.get(symbol, 0) + holders * HELD_SYMBOL_WEIGHT
+
+        for symbol, requests in hot_symbols(self.hot_count):
+            priorities[symbol] = priorities.get(symbol, 0) + requests
+
+        return sorted(priorities, key=lambda symbol: (-priorities[symbol], symbol))
+
+    def _within_budget(self, provider):
+        bucket = upstream.buckets.get(provider)
+        if bucket is None:
+            # Providers without a rate limit, e.g. synthetic data, cost nothing
+            return True
+        reserve = bucket.capacity * (1 - self.budget)
+        return bucket.available() - 1 >= reserve
+
+    def run_cycle(self):
+        """Refresh everything that is due, stopping at the budget; returns the cycle report"""
+        started = time.perf_counter()
+        requests_before = {name: counters['requests'] for name, counters in upstream.stats().items()}
+        primary = QUOTE_PROVIDER_ORDER[0] if QUOTE_PROVIDER_ORDER else 'alphavantage'
+
+        report = {
+            'started_at': datetime.utcnow().isoformat(),
+            'candidates': 0,
+            'quotes_refreshed': 0,
+            'history_synced': 0,
+            'skipped_fresh': 0,
+            'skipped_budget': 0,
+            'errors': 0
+        }
+
+        symbols = self.prioritized_symbols()
+        report['candidates'] = len(symbols)
+
+        for symbol in symbols:
+            if quote_cache.get(symbol) is not None:
+                report['skipped_fresh'] += 1
+            elif not self._within_budget(primary):
+                report['skipped_budget'] += 1
+            else:
+                try:
+                    refresh_quote(symbol)
+                    report['quotes_refreshed'] += 1
+                except Exception as e:
+                    report['errors'] += 1
+                    logger.error(f"Cache warmer failed to refresh quote for {symbol}: {str(e)}")
+
+            if not ohlcv_store.is_due(symbol):
+                continue
+            if not self._within_budget(HISTORY_PROVIDER):
+                report['skipped_budget'] += 1
+                continue
+            try:
+                ohlcv_store.sync(symbol, fetch_daily_series)
+                report['history_synced'] += 1
+            except Exception as e:
+                report['errors'] += 1
+                logger.error(f"Cache warmer failed to sync history for {symbol}: {str(e)}")
+
+        report['duration_seconds'] = round(time.perf_counter() - started, 3)
+        report['budget'] = {}
+        for name, counters in upstream.stats().items():
+            report['budget'][name] = {
+                'requests_used': counters['requests'] - requests_before.get(name, 0),
+                'tokens_remaining': counters['tokens_available'],
+                'per_minute': counters['per_minute']
+            }
+
+        self.last_report = report
+        logger.info(
+            f"Cache warm cycle: {report['quotes_refreshed']} quotes, {report['history_synced']} histories, "
+            f"{report['skipped_budget']} over budget in {report['duration_seconds']}s"
+        )
+        return report
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    self.run_cycle()
+                except Exception as e:
+                    logger.error(f"Cache warm cycle failed: {str(e)}")
+                finally:
+                    db.session.remove()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Run cycles on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name='cache-warmer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,423 @@
+from .cache import TTLCache, make_shared_backend
+from scipy.signal import lfilter
+from collections import deque
+import os
+import math
+import threading
+import numpy as np
+
+# Periods used by calculate_technical_indicators, the full-recompute reference
+SMA_PERIODS = (20, 50)
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BB_PERIOD = 20
+BB_STDDEV = 2
+EMA_SPANS = (12, 26)
+ATR_PERIOD = 14
+STOCH_PERIOD = 14
+STOCH_SMOOTH = 3
+
+# Extra history computed ahead of the requested window so EMAs and rolling windows are warmed up
+INDICATOR_WARMUP_BARS = 250
+
+# Re-add the window from scratch this often so float error in the running sums can't accumulate
+RESYNC_EVERY = 1000
+
+# Keys include the last bar date, so entries only need to outlive the trading day
+INDICATOR_CACHE_TTL = float(os.getenv('INDICATOR_CACHE_TTL', '86400'))
+
+# Rows (symbols) per vectorized pass in panel mode, bounding the temporaries per pass
+PANEL_CHUNK_ROWS = int(os.getenv('PANEL_CHUNK_ROWS', '256'))
+
+
+class RollingWindow:
+    """Fixed-size window with running sum and sum of squares"""
+
+    __slots__ = ('size', 'values', 'sum', 'sumsq', '_updates')
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self._updates = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.sum -= old
+            self.sumsq -= old * old
+        self.values.append(value)
+        self.sum += value
+        self.sumsq += value * value
+
+        self._updates += 1
+        if self._updates >= RESYNC_EVERY:
+            self.sum = math.fsum(self.values)
+            self.sumsq = math.fsum(v * v for v in self.values)
+            self._updates = 0
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.sum / self.size if self.full else None
+
+    def std(self):
+        """Sample standard deviation (ddof=1), like pandas rolling().std()"""
+        if not self.full or self.size < 2:
+            return None
+        variance = (self.sumsq - self.sum * self.sum / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class EMA:
+    """Exponential moving average seeded with the first value, like ewm(adjust=False)"""
+
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1)
+        self.value = None
+
+    def update(self, x):
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class IndicatorState:
+    """Running state for one symbol; each new close updates every indicator in O(1)"""
+
+    def __init__(self):
+        self.windows = {period: RollingWindow(period) for period in set(SMA_PERIODS + (BB_PERIOD,))}
+        self.gains = RollingWindow(RSI_PERIOD)
+        self.losses = RollingWindow(RSI_PERIOD)
+        self.ema_fast = EMA(MACD_FAST)
+        self.ema_slow = EMA(MACD_SLOW)
+        self.signal = EMA(MACD_SIGNAL)
+        self.prev_close = None
+        self.last_date = None
+        self.count = 0
+        self.latest = {}
+
+    def update(self, close, date=None):
+        """Add one bar's close and return the indicator values as of that bar"""
+        close = float(close)
+        for window in self.windows.values():
+            window.push(close)
+
+        # The reference treats the first bar's missing change as zero gain and zero loss
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gains.push(max(delta, 0.0))
+        self.losses.push(max(-delta, 0.0))
+        self.prev_close = close
+
+        macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        signal = self.signal.update(macd)
+
+        values = {f'SMA_{period}': self.windows[period].mean() for period in SMA_PERIODS}
+        values['RSI'] = self._rsi()
+        values['MACD'] = macd
+        values['Signal_Line'] = signal
+
+        bb = self.windows[BB_PERIOD]
+        middle, std = bb.mean(), bb.std()
+        values['BB_middle'] = middle
+        values['BB_upper'] = middle + BB_STDDEV * std if std is not None else None
+        values['BB_lower'] = middle - BB_STDDEV * std if std is not None else None
+
+        self.last_date = date
+        self.count += 1
+        self.latest = values
+        return values
+
+    def _rsi(self):
+        if not self.gains.full:
+            return None
+        gain = self.gains.mean()
+        loss = self.losses.mean()
+        if loss == 0:
+            return 100.0 if gain > 0 else None
+        return 100 - 100 / (1 + gain / loss)
+
+
+class IndicatorEngine:
+    """Per-symbol IndicatorState, fed from the daily bar store"""
+
+    def __init__(self):
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _symbol_lock(self, symbol):
+        with self._lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def update(self, symbol, bars):
+        """Feed bars (oldest first) newer than the symbol's state and return its latest values.
+
+        The first call replays the whole history; after that only new bars
+        are processed, one O(1) update each.
+        """
+        with self._symbol_lock(symbol):
+            state = self._states.get(symbol)
+            if state is None:
+                state = self._states[symbol] = IndicatorState()
+
+            dates = bars['date']
+            start = 0
+            if state.last_date is not None:
+                # Bars are sorted by date, so skip straight past the ones already applied
+                start = int(dates.searchsorted(state.last_date, side='right'))
+
+            for date, close in zip(dates[start:], bars['close'][start:]):
+                state.update(close, date)
+
+            return {
+                'as_of': str(state.last_date) if state.last_date is not None else None,
+                'bars': state.count,
+                'values': dict(state.latest)
+            }
+
+    def reset(self, symbol=None):
+        """Drop cached state for symbol, or for every symbol"""
+        with self._lock:
+            if symbol is None:
+                self._states.clear()
+            else:
+                self._states.pop(symbol, None)
+
+    def stats(self):
+        with self._lock:
+            return {'symbols': len(self._states)}
+
+
+indicator_engine = IndicatorEngine()
+
+
+# Vectorized kernels. Each works along the last axis, so the same code handles
+# one series (T,) and a symbol x time panel (S, T). Warm-up positions are NaN.
+
+def _window_sums(x, period):
+    """Rolling sum, sum of squares and count of non-NaN values over the last axis"""
+    valid = ~np.isnan(x)
+    # Centre each row on its first value so the running sums stay small
+    first = np.take_along_axis(x, valid.argmax(axis=-1)[..., None], axis=-1)
+    shifted = np.where(valid, x - np.where(np.isnan(first), 0.0, first), 0.0)
+
+    def rolling(values):
+        c = np.cumsum(values, axis=-1)
+        out = c.copy()
+        out[..., period:] = c[..., period:] - c[..., :-period]
+        return out
+
+    return rolling(shifted), rolling(shifted * shifted), rolling(valid.astype('f8')), first
+
+
+def rolling_mean(x, period):
+    x = np.asarray(x, dtype='f8')
+    total, _, count, first = _window_sums(x, period)
+    out = total / period + first
+    out[count < period] = np.nan
+    return out
+
+
+def rolling_std(x, period, ddof=1):
+    x = np.asarray(x, dtype='f8')
+    total, squares, count, _ = _window_sums(x, period)
+    variance = (squares - total * total / period) / (period - ddof)
+    out = np.sqrt(np.maximum(variance, 0.0))
+    out[count < period] = np.nan
+    return out
+
+
+def ema(x, span):
+    """EMA seeded with the first non-NaN value, like ewm(span, adjust=False)"""
+    return _exp_smooth(x, 2.0 / (span + 1))
+
+
+def _exp_smooth(x, alpha):
+    x = np.asarray(x, dtype='f8')
+    valid = ~np.isnan(x)
+    start = valid.argmax(axis=-1)[..., None]
+    positions = np.arange(x.shape[-1])
+    leading = positions < start
+
+    # Hold the first value through the leading gap so the filter starts from it
+    seed = np.take_along_axis(x, start, axis=-1)
+    filled = np.where(leading, seed, x)
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], filled, axis=-1, zi=(1.0 - alpha) * filled[..., :1])
+    out[leading | ~valid.any(axis=-1, keepdims=True)] = np.nan
+    return out
+
+
+def rsi(close, period=RSI_PERIOD):
+    """RSI over simple rolling averages of gains and losses, matching the reference"""
+    close = np.asarray(close, dtype='f8')
+    delta = np.diff(close, axis=-1, prepend=np.nan)
+    # A series' first bar counts as zero gain and zero loss, as in the reference
+    delta[np.isnan(delta) & ~np.isnan(close)] = 0.0
+    gain = rolling_mean(np.maximum(delta, 0.0), period)
+    loss = rolling_mean(np.maximum(-delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + gain / loss)
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    line = ema(close, fast) - ema(close, slow)
+    return line, ema(line, signal)
+
+
+def bollinger(close, period=BB_PERIOD, stddev=BB_STDDEV):
+    middle = rolling_mean(close, period)
+    std = rolling_std(close, period)
+    return middle, middle + stddev * std, middle - stddev * std
+
+
+def rolling_extreme(x, period, reducer):
+    """Rolling min or max (reducer=np.min/np.max) over the last axis"""
+    x = np.asarray(x, dtype='f8')
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(x, period, axis=-1)
+        out[..., period - 1:] = reducer(windows, axis=-1)
+    return out
+
+
+def atr(high, low, close, period=ATR_PERIOD):
+    """Average true range with Wilder smoothing"""
+    high, low, close = (np.asarray(values, dtype='f8') for values in (high, low, close))
+    prev_close = np.concatenate((close[..., :1], close[..., :-1]), axis=-1)
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    out = _exp_smooth(true_range, 1.0 / period)
+    out[..., :period - 1] = np.nan
+    return out
+
+
+def stochastic(high, low, close, period=STOCH_PERIOD, smooth=STOCH_SMOOTH):
+    """%K and its simple moving average %D"""
+    lowest = rolling_extreme(low, period, np.min)
+    highest = rolling_extreme(high, period, np.max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100 * (np.asarray(close, dtype='f8') - lowest) / (highest - lowest)
+    return k, rolling_mean(k, smooth)
+
+
+def obv(close, volume):
+    """On-balance volume, starting from zero"""
+    close = np.asarray(close, dtype='f8')
+    direction = np.sign(np.diff(close, axis=-1, prepend=close[..., :1]))
+    return np.cumsum(direction * np.asarray(volume, dtype='f8'), axis=-1)
+
+
+def vwap(high, low, close, volume):
+    """Volume-weighted average of the typical price, anchored at the first bar"""
+    typical = (np.asarray(high, dtype='f8') + low + close) / 3
+    volume = np.asarray(volume, dtype='f8')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.cumsum(typical * volume, axis=-1) / np.cumsum(volume, axis=-1)
+
+
+def core_indicators(close):
+    """The calculate_technical_indicators set, computed with the kernels above"""
+    values = {f'SMA_{period}': rolling_mean(close, period) for period in SMA_PERIODS}
+    values['RSI'] = rsi(close)
+    values['MACD'], values['Signal_Line'] = macd(close)
+    values['BB_middle'], values['BB_upper'], values['BB_lower'] = bollinger(close)
+    return values
+
+
+def align_closes(series):
+    """Align {symbol: bars} onto one date axis; returns (symbols, dates, closes).
+
+    closes is shaped (symbols, dates). Gaps after a symbol's first bar are
+    forward-filled; dates before it stay NaN.
+    """
+    symbols = list(series)
+    dates = np.unique(np.concatenate([np.asarray(series[symbol]['date']) for symbol in symbols])) \
+        if symbols else np.empty(0, dtype='datetime64[D]')
+    closes = np.full((len(symbols), len(dates)), np.nan)
+    for i, symbol in enumerate(symbols):
+        bars = series[symbol]
+        closes[i, dates.searchsorted(np.asarray(bars['date']))] = bars['close']
+
+    # Forward fill: carry the index of the last seen value along each row
+    positions = np.where(~np.isnan(closes), np.arange(len(dates)), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    closes = np.take_along_axis(closes, positions, axis=1)
+    return symbols, dates, closes
+
+
+def panel_indicators(closes, chunk_rows=PANEL_CHUNK_ROWS, tail=None):
+    """Compute the core indicators for every row of a (symbols, time) close panel.
+
+    Rows are processed chunk_rows at a time so temporaries stay bounded. With
+    tail, only the last tail columns of each indicator are kept, which is all
+    a screen over the latest bar needs.
+    """
+    closes = np.asarray(closes, dtype='f8')
+    rows, columns = closes.shape
+    width = columns if tail is None else min(tail, columns)
+    results = {}
+
+    for start in range(0, rows, chunk_rows):
+        chunk = core_indicators(closes[start:start + chunk_rows])
+        for name, values in chunk.items():
+            if name not in results:
+                results[name] = np.empty((rows, width))
+            results[name][start:start + chunk_rows] = values[:, columns - width:]
+
+    return results
+
+
+indicator_cache = TTLCache(
+    'indicators',
+    ttl=INDICATOR_CACHE_TTL,
+    shared_backend=make_shared_backend('indicators')
+)
+
+INDICATOR_NAMES = ('sma', 'ema', 'rsi', 'macd', 'bollinger', 'atr', 'stochastic', 'obv', 'vwap')
+
+
+def compute_indicators(bars, names, lookback):
+    """Compute the selected indicators over daily bars (oldest first).
+
+    Returns (dates, {column: values}) for the last lookback bars. Rolling
+    indicators are computed over INDICATOR_WARMUP_BARS of extra history;
+    OBV and VWAP are anchored at the first returned bar.
+    """
+    window = bars[-(lookback + INDICATOR_WARMUP_BARS):]
+    high, low, close, volume = (np.asarray(window[field], dtype='f8') for field in ('high', 'low', 'close', 'volume'))
+    columns = {}
+
+    if 'sma' in names:
+        for period in SMA_PERIODS:
+            columns[f'sma_{period}'] = rolling_mean(close, period)
+    if 'ema' in names:
+        for span in EMA_SPANS:
+            columns[f'ema_{span}'] = ema(close, span)
+    if 'rsi' in names:
+        columns['rsi'] = rsi(close)
+    if 'macd' in names:
+        line, signal = macd(close)
+        columns['macd'] = line
+        columns['macd_signal'] = signal
+        columns['macd_histogram'] = line - signal
+    if 'bollinger' in names:
+        columns['bb_middle'], columns['bb_upper'], columns['bb_lower'] = bollinger(close)
+    if 'atr' in names:
+        columns['atr'] = atr(high, low, close)
+    if 'stochastic' in names:
+        columns['stoch_k'], columns['stoch_d'] = stochastic(high, low, close)
+
+    columns = {name: values[-lookback:] for name, values in columns.items()}
+    tail = slice(len(window) - min(lookback, len(window)), None)
+    if 'obv' in names:
+        columns['obv'] = obv(close[tail], volume[tail])
+    if 'vwap' in names:
+        columns['vwap'] = vwap(high[tail], low[tail], close[tail], volume[tail])
+
+    return np.asarray(window['date'][tail]), columns
@@ -0,0 +1,138 @@
+from .concurrency import with_app_context
+from .models import db
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import time
+import uuid
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', '2'))
+ANALYSIS_JOB_MAX_PENDING = int(os.getenv('ANALYSIS_JOB_MAX_PENDING', '100'))
+# Finished jobs stay pollable for this long
+ANALYSIS_JOB_RETENTION = float(os.getenv('ANALYSIS_JOB_RETENTION', '3600'))
+
+
+class QueueFull(Exception):
+    """Too many jobs waiting to run"""
+
+
+class Job:
+    def __init__(self, key, owner=None):
+        self.id = str(uuid.uuid4())
+        self.key = key
+        # Users allowed to see this job; deduplicated submitters are added as they arrive
+        self.owners = {owner}
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+        self._finished_monotonic = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobQueue:
+    """In-process job runner on a bounded thread pool.
+
+    Submitting a key that already has a queued or running job returns that
+    job instead of starting another, so identical requests share one run.
+    Jobs are only visible to the owners that submitted them.
+    """
+
+    def __init__(self, name, workers, max_pending, retention):
+        self.name = name
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-job')
+        self._jobs = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+
+    def submit(self, key, fn, *args, owner=None):
+        """Queue fn(*args) under key for owner; returns (job, created)"""
+        with self._lock:
+            self._prune()
+            job = self._active.get(key)
+            if job is not None:
+                job.owners.add(owner)
+                self.deduplicated += 1
+                return job, False
+
+            pending = sum(1 for active in self._active.values() if active.status == 'queued')
+            if pending >= self.max_pending:
+                raise QueueFull(f'{self.name} queue is full')
+
+            job = Job(key, owner)
+            self._jobs[job.id] = job
+            self._active[key] = job
+
+        self._executor.submit(with_app_context(self._run), job, fn, args)
+        return job, True
+
+    def _run(self, job, fn, args):
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        try:
+            job.result = fn(*args)
+            job.status = 'done'
+        except Exception as e:
+            logger.error(f"{self.name} job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            db.session.remove()
+            job.finished_at = datetime.utcnow()
+            job._finished_monotonic = time.monotonic()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            job.finished.set()
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job._finished_monotonic is not None and job._finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id, owner=None):
+        """Return the job if owner submitted it, otherwise None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or owner not in job.owners:
+                return None
+            return job
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                'jobs': statuses,
+                'deduplicated': self.deduplicated,
+                'max_pending': self.max_pending
+            }
+
+
+analysis_jobs = JobQueue('analysis', ANALYSIS_JOB_WORKERS, ANALYSIS_JOB_MAX_PENDING, ANALYSIS_JOB_RETENTION)
@@ -0,0 +1,441 @@
+from flask import current_app
+from .cache import TTLCache, make_shared_backend
+from .concurrency import with_app_context
+from .ohlcv_store import OHLCVStore, parse_daily_series, parse_intraday_series
+from .upstream import upstream
+from .streaming import QuoteHub
+from .synthetic import SyntheticMarketData
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import Counter
+import threading
+import os
+from datetime import datetime
+import numpy as np
+
+ALPHA_VANTAGE_URL = 'https://www.alphavantage.co/query'
+FINNHUB_URL = 'https://finnhub.io/api/v1'
+
+QUOTE_CACHE_TTL = float(os.getenv('QUOTE_CACHE_TTL', '60'))
+QUOTE_CACHE_STALE_TTL = float(os.getenv('QUOTE_CACHE_STALE_TTL', '300'))
+QUOTE_BATCH_WORKERS = int(os.getenv('QUOTE_BATCH_WORKERS', '8'))
+QUOTE_BATCH_MAX_SYMBOLS = int(os.getenv('QUOTE_BATCH_MAX_SYMBOLS', '50'))
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', '86400'))
+INTRADAY_CACHE_TTL = float(os.getenv('INTRADAY_CACHE_TTL', '60'))
+# Bar sizes in minutes that Alpha Vantage TIME_SERIES_INTRADAY supports
+INTRADAY_INTERVALS = (1, 5, 15, 30, 60)
+OHLCV_STORE_DIR = os.getenv(
+    'OHLCV_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'ohlcv')
+)
+OHLCV_SYNC_INTERVAL = float(os.getenv('OHLCV_SYNC_INTERVAL', '3600'))
+
+# 'synthetic' serves quotes, daily and intraday history from the seeded generator
+# instead of the network, for load tests and offline development
+MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'live').lower()
+SYNTHETIC_SEED = int(os.getenv('SYNTHETIC_SEED', '42'))
+SYNTHETIC_LATENCY_MS = float(os.getenv('SYNTHETIC_LATENCY_MS', '0'))
+SYNTHETIC_LATENCY_JITTER_MS = float(os.getenv('SYNTHETIC_LATENCY_JITTER_MS', '0'))
+SYNTHETIC_ERROR_RATE = float(os.getenv('SYNTHETIC_ERROR_RATE', '0'))
+# Bars per 'compact' synthetic history payload, matching Alpha Vantage
+SYNTHETIC_COMPACT_BARS = 100
+
+# Quote providers are tried in this order; providers with an open circuit are skipped
+QUOTE_PROVIDER_ORDER = [
+    name.strip() for name in os.getenv('QUOTE_PROVIDER_ORDER', 'alphavantage,finnhub').split(',') if name.strip()
+]
+HISTORY_PROVIDER = 'alphavantage'
+if MARKET_DATA_PROVIDER == 'synthetic':
+    QUOTE_PROVIDER_ORDER = ['synthetic']
+    HISTORY_PROVIDER = 'synthetic'
+    # Keep generated bars apart from real ones
+    OHLCV_STORE_DIR = os.path.join(OHLCV_STORE_DIR, 'synthetic')
+# With hedging on, the next provider is fired if the current one hasn't answered
+# within QUOTE_HEDGE_DELAY seconds ('auto' uses the provider's p95 latency)
+QUOTE_HEDGE_ENABLED = os.getenv('QUOTE_HEDGE_ENABLED', 'false').lower() == 'true'
+QUOTE_HEDGE_DELAY = os.getenv('QUOTE_HEDGE_DELAY', 'auto')
+QUOTE_HEDGE_MIN_DELAY = 0.1
+QUOTE_STREAM_INTERVAL = float(os.getenv('QUOTE_STREAM_INTERVAL', '15'))
+QUOTE_HEDGE_MAX_DELAY = 2.0
+
+quote_cache = TTLCache(
+    'quotes',
+    ttl=QUOTE_CACHE_TTL,
+    stale_ttl=QUOTE_CACHE_STALE_TTL,
+    shared_backend=make_shared_backend('quotes')
+)
+
+# Symbol search results barely change, so keep them for a day by default
+search_cache = TTLCache(
+    'symbol_search',
+    ttl=SEARCH_CACHE_TTL,
+    stale_ttl=SEARCH_CACHE_TTL,
+    shared_backend=make_shared_backend('symbol_search')
+)
+
+intraday_cache = TTLCache(
+    'intraday',
+    ttl=INTRADAY_CACHE_TTL,
+    shared_backend=make_shared_backend('intraday')
+)
+
+ohlcv_store = OHLCVStore(OHLCV_STORE_DIR, sync_interval=OHLCV_SYNC_INTERVAL)
+
+synthetic_market = SyntheticMarketData(
+    seed=SYNTHETIC_SEED,
+    latency_ms=SYNTHETIC_LATENCY_MS,
+    latency_jitter_ms=SYNTHETIC_LATENCY_JITTER_MS,
+    error_rate=SYNTHETIC_ERROR_RATE
+)
+# Mock fallback quotes come from the same paths, without injected latency or errors
+mock_market = SyntheticMarketData(seed=SYNTHETIC_SEED)
+
+def fetch_alpha_vantage_quote(symbol):
+    """Fetch a quote from Alpha Vantage, or None if unavailable"""
+    api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        return None
+
+    data = upstream.get_json('alphavantage', ALPHA_VANTAGE_URL, params={
+        'function': 'GLOBAL_QUOTE',
+        'symbol': symbol,
+        'apikey': api_key
+    })
+
+    if 'Global Quote' not in data or not data['Global Quote']:
+        return None
+
+    quote = data['Global Quote']
+    return {
+        'symbol': symbol,
+        'price': float(quote.get('05. price', 0)),
+        'change': float(quote.get('09. change', 0)),
+        'change_percent': float(quote.get('10. change percent', '0%').replace('%', '')),
+        'volume': int(quote.get('06. volume', 0)),
+        'latest_trading_day': quote.get('07. latest trading day', datetime.now().strftime('%Y-%m-%d')),
+        'source': 'Alpha Vantage'
+    }
+
+def fetch_finnhub_quote(symbol):
+    """Fetch a quote from Finnhub, or None if unavailable"""
+    finnhub_key = os.environ.get('FINNHUB_API_KEY')
+    if not finnhub_key:
+        return None
+
+    data = upstream.get_json('finnhub', f'{FINNHUB_URL}/quote', params={
+        'symbol': symbol,
+        'token': finnhub_key
+    })
+
+    if not data or 'c' not in data:
+        return None
+
+    return {
+        'symbol': symbol,
+        'price': float(data.get('c', 0)),
+        'change': float(data.get('d', 0)),
+        'change_percent': float(data.get('dp', 0)),
+        'high': float(data.get('h', 0)),
+        'low': float(data.get('l', 0)),
+        'volume': int(data.get('v', 0)),
+        'latest_trading_day': datetime.fromtimestamp(data.get('t', 0)).strftime('%Y-%m-%d'),
+        'source': 'Finnhub'
+    }
+
+def generate_mock_quote(symbol):
+    """Generate mock data when API fails or limits are reached"""
+    popular_names = {
+        'AAPL': 'Apple Inc.',
+        'MSFT': 'Microsoft Corporation',
+        'GOOGL': 'Alphabet Inc.',
+        'AMZN': 'Amazon.com Inc.',
+        'META': 'Meta Platforms Inc.',
+        'TSLA': 'Tesla Inc.',
+        'NVDA': 'NVIDIA Corporation'
+    }
+
+    # Deterministic per symbol, without touching the global random state
+    quote = mock_market.quote(symbol)
+    quote['name'] = popular_names.get(quote['symbol'], f"{quote['symbol']} Inc.")
+    quote['market_cap'] = quote['price'] * quote['volume']
+    quote['source'] = 'Mock Data'
+    return quote
+
+def fetch_synthetic_quote(symbol):
+    """Quote from the synthetic provider"""
+    return synthetic_market.quote(symbol)
+
+QUOTE_FETCHERS = {
+    'alphavantage': fetch_alpha_vantage_quote,
+    'finnhub': fetch_finnhub_quote,
+    'synthetic': fetch_synthetic_quote
+}
+
+_hedge_executor = ThreadPoolExecutor(max_workers=QUOTE_BATCH_WORKERS * 2)
+_hedge_counters = {'hedged': 0, 'hedge_wins': 0}
+_hedge_lock = threading.Lock()
+
+def _count_hedge(counter):
+    with _hedge_lock:
+        _hedge_counters[counter] += 1
+
+def hedge_delay(provider):
+    """Seconds to wait on provider before firing the next one"""
+    if QUOTE_HEDGE_DELAY != 'auto':
+        return float(QUOTE_HEDGE_DELAY)
+    breaker = upstream.breakers.get(provider)
+    p95 = breaker.p95_latency() if breaker else None
+    if p95 is None:
+        return 0.5
+    return min(QUOTE_HEDGE_MAX_DELAY, max(QUOTE_HEDGE_MIN_DELAY, p95))
+
+def _fetch_sequential(symbol, providers):
+    for provider in providers:
+        try:
+            quote = QUOTE_FETCHERS[provider](symbol)
+        except Exception as e:
+            current_app.logger.error(f"Error getting stock quote from {provider}: {str(e)}")
+            continue
+        if quote:
+            return quote
+    return None
+
+def _fetch_hedged(symbol, providers):
+    remaining = list(providers)
+    pending = {}
+    # Futures started by the hedge timer, as opposed to plain fallbacks after a failure
+    hedges = set()
+
+    def launch():
+        provider = remaining.pop(0)
+        future = _hedge_executor.submit(with_app_context(QUOTE_FETCHERS[provider]), symbol)
+        pending[future] = provider
+        return future
+
+    launch()
+    while pending:
+        timeout = hedge_delay(providers[len(providers) - len(remaining) - 1]) if remaining else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            # The in-flight provider is slow, race the next one against it
+            _count_hedge('hedged')
+            hedges.add(launch())
+            continue
+
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                quote = future.result()
+            except Exception as e:
+                current_app.logger.error(f"Error getting stock quote from {provider}: {str(e)}")
+                continue
+            if quote:
+                if future in hedges:
+                    _count_hedge('hedge_wins')
+                return quote
+
+        # Everything in flight failed, fall through to the next provider right away
+        if not pending and remaining:
+            launch()
+
+    return None
+
+def fetch_quote(symbol):
+    """Walk the quote providers in order, falling back to mock data"""
+    providers = [
+        name for name in QUOTE_PROVIDER_ORDER
+        if name in QUOTE_FETCHERS and (name not in upstream.breakers or upstream.breakers[name].available())
+    ]
+
+    quote = None
+    if providers:
+        if QUOTE_HEDGE_ENABLED and len(providers) > 1:
+            quote = _fetch_hedged(symbol, providers)
+        else:
+            quote = _fetch_sequential(symbol, providers)
+
+    # If every provider fails, is open or limits are reached, use mock data
+    return quote or generate_mock_quote(symbol)
+
+def quote_provider_stats():
+    """Provider order, hedging settings and hedge counters for the metrics endpoint"""
+    with _hedge_lock:
+        stats = dict(_hedge_counters)
+    stats['order'] = QUOTE_PROVIDER_ORDER
+    stats['hedging'] = QUOTE_HEDGE_ENABLED
+    stats['hedge_delays'] = {
+        name: round(hedge_delay(name), 4) for name in QUOTE_PROVIDER_ORDER if name in QUOTE_FETCHERS
+    }
+    return stats
+
+def refresh_quote(symbol):
+    """Fetch a fresh quote for symbol and store it in the quote cache"""
+    quote = fetch_quote(symbol)
+    quote_cache.set(symbol, quote)
+    return quote
+
+# One shared poller per streamed symbol, whatever the number of open streams
+quote_hub = QuoteHub(refresh_quote, QUOTE_STREAM_INTERVAL)
+
+_symbol_requests = Counter()
+_symbol_requests_lock = threading.Lock()
+
+def record_symbol_requests(symbols):
+    with _symbol_requests_lock:
+        _symbol_requests.update(symbols)
+
+def hot_symbols(count, decay=True):
+    """Return the most requested symbols as (symbol, requests) pairs.
+
+    With decay, every count is halved afterwards so popularity tracks
+    recent traffic.
+    """
+    with _symbol_requests_lock:
+        hot = _symbol_requests.most_common(count)
+        if decay:
+            for symbol in list(_symbol_requests):
+                _symbol_requests[symbol] //= 2
+                if not _symbol_requests[symbol]:
+                    del _symbol_requests[symbol]
+    return hot
+
+def get_quote(symbol):
+    """Return (quote, cache_status) for symbol through the shared quote cache"""
+    symbol = symbol.upper()
+    record_symbol_requests([symbol])
+    return _load_quote(symbol)
+
+def _load_quote(symbol):
+    return quote_cache.get_or_load(symbol, lambda: fetch_quote(symbol))
+
+def get_quotes(symbols):
+    """Resolve many symbols at once, fetching cache misses concurrently.
+
+    Returns one entry per symbol, in input order, with the quote, its source,
+    the cache status and an error message if the symbol could not be resolved.
+    """
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    record_symbol_requests(symbols)
+    results = {}
+    pending = []
+
+    # Cached symbols (fresh or stale) resolve immediately
+    for symbol in symbols:
+        quote, cache_status = quote_cache.lookup(symbol, lambda symbol=symbol: fetch_quote(symbol))
+        if cache_status == 'miss':
+            pending.append(symbol)
+        else:
+            results[symbol] = _batch_entry(symbol, quote, cache_status)
+
+    # Everything else is fetched in parallel on a bounded pool
+    if pending:
+        def resolve(symbol):
+            try:
+                quote, cache_status = _load_quote(symbol)
+                return _batch_entry(symbol, quote, cache_status)
+            except Exception as e:
+                return _batch_entry(symbol, None, 'miss', error=str(e))
+
+        with ThreadPoolExecutor(max_workers=min(QUOTE_BATCH_WORKERS, len(pending))) as executor:
+            for entry in executor.map(with_app_context(resolve), pending):
+                results[entry['symbol']] = entry
+
+    return [results[symbol] for symbol in symbols]
+
+def _batch_entry(symbol, quote, cache_status, error=None):
+    return {
+        'symbol': symbol,
+        'quote': quote,
+        'source': quote.get('source') if quote else None,
+        'cache': cache_status,
+        'error': error
+    }
+
+def fetch_symbol_matches(keywords):
+    """Fetch Alpha Vantage SYMBOL_SEARCH matches for keywords"""
+    if MARKET_DATA_PROVIDER == 'synthetic':
+        # Synthetic mode stays offline; the local symbol index is the only source
+        raise LookupError('No search results found')
+
+    api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        raise LookupError('No search results found')
+
+    data = upstream.get_json('alphavantage', ALPHA_VANTAGE_URL, params={
+        'function': 'SYMBOL_SEARCH',
+        'keywords': keywords,
+        'apikey': api_key
+    })
+
+    # Raise rather than return so quota errors never get cached as "no matches"
+    if 'bestMatches' not in data:
+        raise LookupError('No search results found')
+
+    return data['bestMatches']
+
+def search_symbols(keywords):
+    """Return (matches, cache_status) for keywords through the search cache"""
+    key = keywords.strip().lower()
+    return search_cache.get_or_load(key, lambda: fetch_symbol_matches(keywords.strip()))
+
+def fetch_daily_series(symbol, outputsize='compact'):
+    """Fetch Alpha Vantage TIME_SERIES_DAILY bars for symbol, oldest first"""
+    if HISTORY_PROVIDER == 'synthetic':
+        return synthetic_market.daily(symbol, days=SYNTHETIC_COMPACT_BARS if outputsize == 'compact' else None)
+
+    api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        raise LookupError('Historical data not found')
+
+    data = upstream.get_json('alphavantage', ALPHA_VANTAGE_URL, params={
+        'function': 'TIME_SERIES_DAILY',
+        'symbol': symbol,
+        'outputsize': outputsize,
+        'apikey': api_key
+    })
+
+    if 'Time Series (Daily)' not in data:
+        raise LookupError('Historical data not found')
+
+    return parse_daily_series(data['Time Series (Daily)'])
+
+def fetch_intraday_series(symbol, interval_minutes=5):
+    """Fetch the latest session's intraday bars for symbol, oldest first"""
+    if HISTORY_PROVIDER == 'synthetic':
+        return synthetic_market.intraday(symbol, interval_minutes)
+
+    api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        raise LookupError('Intraday data not found')
+
+    data = upstream.get_json('alphavantage', ALPHA_VANTAGE_URL, params={
+        'function': 'TIME_SERIES_INTRADAY',
+        'symbol': symbol,
+        'interval': f'{interval_minutes}min',
+        'apikey': api_key
+    })
+
+    key = f'Time Series ({interval_minutes}min)'
+    if key not in data:
+        raise LookupError('Intraday data not found')
+
+    return parse_intraday_series(data[key])
+
+def get_intraday(symbol, interval_minutes=5):
+    """Return (series, cache_status) with intraday timestamps, prices and volumes for symbol"""
+    symbol = symbol.upper()
+
+    def load():
+        bars = fetch_intraday_series(symbol, interval_minutes)
+        return {
+            'timestamps': np.datetime_as_string(bars['timestamp']).tolist(),
+            'prices': bars['close'].tolist(),
+            'volumes': bars['volume'].tolist()
+        }
+
+    return intraday_cache.get_or_load(f'{symbol}:{interval_minutes}', load)
+
+def get_daily_bars(symbol):
+    """Return stored daily bars for symbol, appending any new ones from upstream first"""
+    record_symbol_requests([symbol.upper()])
+    return ohlcv_store.get(symbol.upper(), fetch_daily_series)
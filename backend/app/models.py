@@ -18,6 +18,11 @@ class User(db.Model):
         return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
 
 class StockHolding(db.Model):
+    __table_args__ = (
+        # One row per user and symbol; buys upsert against this index
+        db.Index('uq_stock_holding_user_symbol', 'user_id', 'symbol', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     symbol = db.Column(db.String(10), nullable=False)
@@ -26,6 +31,12 @@ class StockHolding(db.Model):
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Transaction(db.Model):
+    __table_args__ = (
+        # Keyset pagination walks (timestamp, id) newest first per user
+        db.Index('ix_transaction_user_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_transaction_user_symbol_timestamp', 'user_id', 'symbol', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     symbol = db.Column(db.String(10), nullable=False)
@@ -34,7 +45,29 @@ class Transaction(db.Model):
     price = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+class PositionLedger(db.Model):
+    """Running average-cost position and realized P&L per user and symbol"""
+    __table_args__ = (
+        db.Index('uq_position_ledger_user_symbol', 'user_id', 'symbol', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    symbol = db.Column(db.String(10), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    cost_basis = db.Column(db.Float, nullable=False, default=0.0)  # open cost including buy fees
+    realized_pnl = db.Column(db.Float, nullable=False, default=0.0)
+    fees = db.Column(db.Float, nullable=False, default=0.0)
+    total_bought = db.Column(db.Float, nullable=False, default=0.0)
+    total_sold = db.Column(db.Float, nullable=False, default=0.0)
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class ChatSession(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_session_user', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     session_id = db.Column(db.String(36), unique=True, nullable=False)
@@ -42,8 +75,28 @@ class ChatSession(db.Model):
     last_interaction = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class ChatMessage(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_message_session_timestamp', 'session_id', 'timestamp'),
+        db.Index('ix_chat_message_session_user_timestamp', 'session_id', 'is_user', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(36), db.ForeignKey('chat_session.session_id'), nullable=False)
     message = db.Column(db.Text, nullable=False)
     is_user = db.Column(db.Boolean, default=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AnalysisResult(db.Model):
+    """LLM stock analysis stored under a fingerprint of everything that went into it"""
+    __table_args__ = (
+        db.Index('ix_analysis_result_expires_at', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint = db.Column(db.String(64), unique=True, nullable=False)
+    symbol = db.Column(db.String(10), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.String(16), nullable=False)
+    result = db.Column(db.Text, nullable=False)  # JSON response body
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
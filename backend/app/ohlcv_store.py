@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One fixed-size record per daily bar, so files can be appended to and memory-mapped
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8')
+])
+
+INTRADAY_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[m]'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8')
+])
+
+ALPHA_VANTAGE_FIELDS = {
+    'open': '1. open',
+    'high': '2. high',
+    'low': '3. low',
+    'close': '4. close',
+    'volume': '5. volume'
+}
+
+
+def parse_daily_series(time_series):
+    """Convert an Alpha Vantage 'Time Series (Daily)' dict into bars sorted by date"""
+    dates = sorted(time_series)
+    bars = np.empty(len(dates), dtype=BAR_DTYPE)
+    bars['date'] = np.array(dates, dtype='datetime64[D]')
+    for field, key in ALPHA_VANTAGE_FIELDS.items():
+        bars[field] = np.array([time_series[date][key] for date in dates], dtype='f8')
+    return bars
+
+
+def parse_intraday_series(time_series):
+    """Convert an Alpha Vantage 'Time Series (Nmin)' dict into bars sorted by timestamp"""
+    timestamps = sorted(time_series)
+    bars = np.empty(len(timestamps), dtype=INTRADAY_DTYPE)
+    bars['timestamp'] = np.array([timestamp[:16].replace(' ', 'T') for timestamp in timestamps], dtype='datetime64[m]')
+    for field, key in ALPHA_VANTAGE_FIELDS.items():
+        bars[field] = np.array([time_series[timestamp][key] for timestamp in timestamps], dtype='f8')
+    return bars
+
+
+class OHLCVStore:
+    """On-disk daily bar store with one append-only binary file per symbol.
+
+    The first sync for a symbol loads the full history; later syncs fetch
+    only the compact (latest ~100 bars) payload and append bars newer than
+    the stored tail.
+    """
+
+    def __init__(self, root, sync_interval=3600):
+        self.root = root
+        self.sync_interval = sync_interval
+        self._last_sync = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol):
+        return os.path.join(self.root, f'{symbol}.bin')
+
+    def _symbol_lock(self, symbol):
+        with self._lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def read(self, symbol):
+        """Return the stored bars for symbol as a read-only memory map"""
+        path = self._path(symbol)
+        if not os.path.exists(path) or os.path.getsize(path) < BAR_DTYPE.itemsize:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode='r')
+
+    def append(self, symbol, bars):
+        """Append bars newer than the stored tail and return how many were written"""
+        existing = self.read(symbol)
+        if len(existing):
+            bars = bars[bars['date'] > existing['date'][-1]]
+        if not len(bars):
+            return 0
+
+        with open(self._path(symbol), 'ab') as f:
+            f.write(np.ascontiguousarray(bars, dtype=BAR_DTYPE).tobytes())
+        return len(bars)
+
+    def is_due(self, symbol):
+        """Return True if the next sync for symbol would hit upstream"""
+        return not len(self.read(symbol)) or time.time() - self._last_sync.get(symbol, 0) >= self.sync_interval
+
+    def sync(self, symbol, fetch_daily):
+        """Bring symbol up to date using fetch_daily(symbol, outputsize)"""
+        with self._symbol_lock(symbol):
+            existing = self.read(symbol)
+            if len(existing) and time.time() - self._last_sync.get(symbol, 0) < self.sync_interval:
+                return 0
+
+            try:
+                if not len(existing):
+                    appended = self.append(symbol, fetch_daily(symbol, 'full'))
+                else:
+                    delta = fetch_daily(symbol, 'compact')
+                    # A compact payload that doesn't reach back to the stored tail leaves a gap
+                    if len(delta) and delta['date'][0] > existing['date'][-1]:
+                        delta = fetch_daily(symbol, 'full')
+                    appended = self.append(symbol, delta)
+            except Exception as e:
+                if not len(existing):
+                    raise
+                logger.warning(f"Serving stored bars for {symbol}, sync failed: {str(e)}")
+                return 0
+
+            self._last_sync[symbol] = time.time()
+            return appended
+
+    def get(self, symbol, fetch_daily):
+        """Sync symbol if it is due and return its stored bars"""
+        self.sync(symbol, fetch_daily)
+        return self.read(symbol)
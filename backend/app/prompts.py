@@ -0,0 +1,174 @@
+import os
+import re
+import math
+
+# Bump whenever the prompt text or layout changes so cached analyses aren't reused
+PROMPT_VERSION = '3'
+ANALYSIS_PROMPT_TOKEN_BUDGET = int(os.getenv('ANALYSIS_PROMPT_TOKEN_BUDGET', '700'))
+
+# Long words split into several BPE tokens; ~4 characters each is close enough for budgeting
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+CHARS_PER_TOKEN = 4
+
+# Alpha Vantage OVERVIEW fields worth sending, most useful first: (key, label, kind)
+OVERVIEW_FIELDS = [
+    ('Name', 'Name', 'text'),
+    ('Sector', 'Sector', 'text'),
+    ('Industry', 'Industry', 'text'),
+    ('MarketCapitalization', 'Market cap', 'money'),
+    ('PERatio', 'P/E', 'number'),
+    ('ForwardPE', 'Fwd P/E', 'number'),
+    ('PEGRatio', 'PEG', 'number'),
+    ('EPS', 'EPS', 'number'),
+    ('RevenueTTM', 'Revenue TTM', 'money'),
+    ('QuarterlyRevenueGrowthYOY', 'Rev growth YoY', 'percent'),
+    ('QuarterlyEarningsGrowthYOY', 'EPS growth YoY', 'percent'),
+    ('ProfitMargin', 'Net margin', 'percent'),
+    ('ReturnOnEquityTTM', 'ROE', 'percent'),
+    ('DividendYield', 'Div yield', 'percent'),
+    ('Beta', 'Beta', 'number'),
+    ('AnalystTargetPrice', 'Analyst target', 'number'),
+]
+
+# Indicator names from app.indicators, with shorter labels
+INDICATOR_LABELS = {
+    'SMA_20': 'SMA20',
+    'SMA_50': 'SMA50',
+    'RSI': 'RSI14',
+    'MACD': 'MACD',
+    'Signal_Line': 'MACD signal',
+    'BB_upper': 'BB upper',
+    'BB_lower': 'BB lower'
+}
+
+DESCRIPTION_MAX_CHARS = 400
+
+ANALYSIS_INSTRUCTIONS = (
+    "You are FinAI's stock analysis expert. Analyze {symbol} using the data below.\n"
+    "Cover: business overview; recent performance and key metrics; technicals; fundamentals; "
+    "industry and competition; risks and opportunities; outlook (bullish, neutral or bearish).\n"
+    "Rules: educational analysis, not financial advice; balanced bull and bear view; "
+    "no price predictions or guarantees; state data limitations; explain jargon.\n"
+    "Use clear, structured sections."
+)
+
+
+def estimate_tokens(text):
+    """Approximate LLM token count without loading a real tokenizer"""
+    return sum(max(1, math.ceil(len(piece) / CHARS_PER_TOKEN)) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def format_number(value, kind='number'):
+    """Render value compactly (1.2T, 35.1%, 182.5), or None if it isn't usable"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(number) or math.isinf(number):
+        return None
+
+    if kind == 'percent':
+        # Alpha Vantage reports ratios (0.25), quotes report percentages already
+        return f'{number * 100:.1f}%'
+    if kind == 'money':
+        for threshold, suffix in ((1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+            if abs(number) >= threshold:
+                return f'{number / threshold:.2f}{suffix}'
+    return f'{number:.4g}' if abs(number) < 1e5 else f'{number:,.0f}'
+
+
+def _quote_lines(quote):
+    parts = [f"price {format_number(quote.get('price'))}"]
+    change = format_number(quote.get('change_percent'))
+    if change:
+        parts.append(f'chg {change}%')
+    if quote.get('high') and quote.get('low'):
+        parts.append(f"day range {format_number(quote['low'])}-{format_number(quote['high'])}")
+    if quote.get('volume'):
+        parts.append(f"vol {format_number(quote['volume'], 'money')}")
+    return [f"Quote ({quote.get('latest_trading_day', 'latest')}): " + ', '.join(parts)]
+
+
+def _history_lines(history):
+    parts = []
+    change = format_number(history.get('change_30d_percent'))
+    if change:
+        parts.append(f'30d chg {change}%')
+    low, high = format_number(history.get('low_52w')), format_number(history.get('high_52w'))
+    if low and high:
+        parts.append(f'52w range {low}-{high}')
+    lines = ['History: ' + ', '.join(parts)] if parts else []
+    indicators = history.get('indicators') or {}
+    values = [
+        f'{label} {format_number(indicators[name])}'
+        for name, label in INDICATOR_LABELS.items() if indicators.get(name) is not None
+    ]
+    if values:
+        lines.append(f"Indicators ({history.get('as_of')}): " + ', '.join(values))
+    return lines
+
+
+def _overview_lines(overview):
+    lines = []
+    for key, label, kind in OVERVIEW_FIELDS:
+        value = overview.get(key)
+        if kind == 'text':
+            formatted = value if value and value not in ('None', '-') else None
+        else:
+            formatted = format_number(value, kind)
+        if formatted:
+            lines.append(f'{label}: {formatted}')
+
+    description = (overview.get('Description') or '').strip()
+    if description:
+        if len(description) > DESCRIPTION_MAX_CHARS:
+            description = description[:DESCRIPTION_MAX_CHARS].rsplit(' ', 1)[0] + '...'
+        lines.append(f'About: {description}')
+    return lines
+
+
+def _news_lines(news):
+    return [f"News {item.get('date')}: {item.get('headline')} ({item.get('source')})" for item in news]
+
+
+# Sections in the order they are allowed into the prompt
+SECTIONS = (
+    ('quote', _quote_lines),
+    ('history', _history_lines),
+    ('overview', _overview_lines),
+    ('news', _news_lines),
+)
+
+
+def build_analysis_prompt(symbol, data=None, budget=ANALYSIS_PROMPT_TOKEN_BUDGET):
+    """Build the analysis system prompt within budget tokens.
+
+    Instructions always go in. Data lines follow in priority order (quote,
+    history, overview, news); any line that would cross the budget is dropped.
+    Returns (prompt, estimated_tokens, dropped_lines).
+    """
+    prompt = ANALYSIS_INSTRUCTIONS.format(symbol=symbol)
+    tokens = estimate_tokens(prompt)
+    dropped = 0
+
+    lines = []
+    for name, render in SECTIONS:
+        if data and data.get(name):
+            lines.extend(render(data[name]))
+
+    if lines:
+        header = f'\nData for {symbol}:'
+        tokens += estimate_tokens(header)
+        prompt += header
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if tokens + cost > budget:
+                dropped += 1
+                continue
+            prompt += '\n' + line
+            tokens += cost
+    else:
+        prompt += '\nNo market data is available; say so and keep the analysis general.'
+        tokens = estimate_tokens(prompt)
+
+    return prompt, tokens, dropped
@@ -1,13 +1,21 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..market_data import get_daily_bars, get_quote, ohlcv_store, ALPHA_VANTAGE_URL
+from ..concurrency import with_app_context
+from ..upstream import upstream, get_groq_client, UpstreamError
+from ..indicators import compute_indicators, indicator_cache, indicator_engine, align_closes, INDICATOR_NAMES
+from ..backtest import sweep, STRATEGIES
+from ..analysis_cache import analysis_fingerprint, get_cached_analysis, store_analysis, analysis_flight
+from ..jobs import analysis_jobs, QueueFull
+from ..streaming import format_sse, sse_response, iter_words, iter_completion_deltas
+from ..prompts import build_analysis_prompt, estimate_tokens, PROMPT_VERSION, ANALYSIS_PROMPT_TOKEN_BUDGET
 import os
-import requests
-import groq
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from sklearn.preprocessing import MinMaxScaler
-import json
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import time
 import random
 
 analysis_bp = Blueprint('analysis', __name__)
@@ -16,6 +24,29 @@ ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
 FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
+ANALYSIS_MODEL = 'llama3-70b-8192'
+
+# Per-source deadlines for gathering analysis inputs, in seconds
+ANALYSIS_SOURCE_TIMEOUT = float(os.getenv('ANALYSIS_SOURCE_TIMEOUT', '5'))
+ANALYSIS_SOURCE_TIMEOUTS = {
+    'overview': float(os.getenv('ANALYSIS_OVERVIEW_TIMEOUT', ANALYSIS_SOURCE_TIMEOUT)),
+    'quote': float(os.getenv('ANALYSIS_QUOTE_TIMEOUT', ANALYSIS_SOURCE_TIMEOUT)),
+    'history': float(os.getenv('ANALYSIS_HISTORY_TIMEOUT', ANALYSIS_SOURCE_TIMEOUT)),
+    'news': float(os.getenv('ANALYSIS_NEWS_TIMEOUT', ANALYSIS_SOURCE_TIMEOUT))
+}
+ANALYSIS_NEWS_ITEMS = 5
+_gather_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ANALYSIS_GATHER_WORKERS', '8')))
+
+# Longest a job poll may block waiting for the result
+ANALYSIS_JOB_MAX_WAIT = 30
+
+BACKTEST_DEFAULT_DAYS = 2520  # about ten years of sessions
+BACKTEST_MAX_SYMBOLS = int(os.getenv('BACKTEST_MAX_SYMBOLS', '500'))
+BACKTEST_MAX_COMBINATIONS = int(os.getenv('BACKTEST_MAX_COMBINATIONS', '100'))
+
+INDICATORS_DEFAULT_LOOKBACK = 100
+INDICATORS_MAX_LOOKBACK = int(os.getenv('INDICATORS_MAX_LOOKBACK', '1000'))
+
 # Mock Groq client for development
 class MockGroqClient:
     def generate_analysis(self, symbol, prompt):
@@ -53,26 +84,21 @@ Opportunities:
 groq_client = MockGroqClient()
 
 def get_stock_data(symbol):
-    # Get historical data
-    url = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}'
-    response = requests.get(url)
-    data = response.json()
-    
-    if 'Time Series (Daily)' not in data:
+    # Get historical data from the local bar store
+    try:
+        bars = get_daily_bars(symbol)
+    except LookupError:
         raise Exception('Unable to fetch stock data')
-    
-    # Convert to DataFrame
-    df = pd.DataFrame.from_dict(data['Time Series (Daily)'], orient='index')
-    df.index = pd.to_datetime(df.index)
-    df = df.astype(float)
-    df = df.rename(columns={
-        '1. open': 'open',
-        '2. high': 'high',
-        '3. low': 'low',
-        '4. close': 'close',
-        '5. volume': 'volume'
-    })
-    
+
+    if not len(bars):
+        raise Exception('Unable to fetch stock data')
+
+    # Convert to DataFrame, oldest bar first
+    df = pd.DataFrame(
+        {field: np.asarray(bars[field]) for field in ('open', 'high', 'low', 'close', 'volume')},
+        index=pd.to_datetime(np.asarray(bars['date']))
+    )
+
     return df
 
 def get_company_news(symbol):
@@ -87,15 +113,117 @@ def get_company_news(symbol):
         'token': FINNHUB_API_KEY
     }
     
-    response = requests.get(url, params=params)
-    news_items = response.json()
+    news_items = upstream.get_json('finnhub', url, params=params)
     
     if not isinstance(news_items, list):
         raise Exception('Unable to fetch company news')
     
     return news_items
 
+def fetch_overview(symbol):
+    api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        return None
+    data = upstream.get_json('alphavantage', ALPHA_VANTAGE_URL, params={
+        'function': 'OVERVIEW',
+        'symbol': symbol,
+        'apikey': api_key
+    })
+    return data if 'Symbol' in data else None
+
+def fetch_live_quote(symbol):
+    quote, _ = get_quote(symbol)
+    # Mock quotes would only mislead the model
+    return None if quote.get('source') == 'Mock Data' else quote
+
+def fetch_price_history(symbol):
+    bars = get_daily_bars(symbol)
+    if not len(bars):
+        return None
+
+    closes = np.asarray(bars['close'])
+    year = bars[-252:]
+    latest = indicator_engine.update(symbol, bars)
+    return {
+        'as_of': latest['as_of'],
+        'close': round(float(closes[-1]), 4),
+        'change_30d_percent': round(float(closes[-1] / closes[-min(31, len(closes))] - 1) * 100, 2),
+        'high_52w': round(float(np.max(year['high'])), 4),
+        'low_52w': round(float(np.min(year['low'])), 4),
+        'indicators': {
+            name: round(value, 4) for name, value in latest['values'].items() if value is not None
+        }
+    }
+
+def fetch_recent_news(symbol):
+    if not FINNHUB_API_KEY:
+        return None
+    news_items = get_company_news(symbol)
+    return [
+        {
+            'headline': item.get('headline'),
+            'source': item.get('source'),
+            'date': datetime.fromtimestamp(item.get('datetime', 0)).strftime('%Y-%m-%d')
+        }
+        for item in news_items[:ANALYSIS_NEWS_ITEMS]
+    ] or None
+
+ANALYSIS_SOURCES = {
+    'overview': fetch_overview,
+    'quote': fetch_live_quote,
+    'history': fetch_price_history,
+    'news': fetch_recent_news
+}
+
+def gather_stock_data(symbol):
+    """Fetch all analysis inputs concurrently, each under its own timeout.
+
+    Returns (stock_data, metadata). stock_data holds only the sources that
+    answered in time (None if none did); metadata records each source's
+    status and elapsed milliseconds.
+    """
+    started = time.perf_counter()
+
+    def timed(fetch):
+        source_started = time.perf_counter()
+        value = fetch(symbol)
+        return value, (time.perf_counter() - source_started) * 1000
+
+    futures = {
+        name: _gather_executor.submit(with_app_context(timed), fetch)
+        for name, fetch in ANALYSIS_SOURCES.items()
+    }
+
+    stock_data = {}
+    sources = {}
+    for name, future in futures.items():
+        timeout = ANALYSIS_SOURCE_TIMEOUTS.get(name, ANALYSIS_SOURCE_TIMEOUT)
+        # Every source started together, so each waits only until its own deadline
+        remaining = max(0.0, started + timeout - time.perf_counter())
+        try:
+            value, elapsed = future.result(timeout=remaining)
+        except FutureTimeout:
+            sources[name] = {'status': 'timeout', 'ms': round(timeout * 1000)}
+            current_app.logger.warning(f"Analysis source {name} timed out for {symbol}")
+            continue
+        except Exception as e:
+            sources[name] = {'status': 'error', 'error': str(e)}
+            current_app.logger.warning(f"Analysis source {name} failed for {symbol}: {str(e)}")
+            continue
+
+        sources[name] = {'status': 'ok' if value else 'missing', 'ms': round(elapsed, 1)}
+        if value:
+            stock_data[name] = value
+
+    metadata = {
+        'sources': sources,
+        'gather_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+    return stock_data or None, metadata
+
 def calculate_technical_indicators(df):
+    # Full recompute over the whole frame. This is the reference for the
+    # incremental engine in app.indicators, so keep the two in step
     # Moving averages
     df['SMA_20'] = df['close'].rolling(window=20).mean()
     df['SMA_50'] = df['close'].rolling(window=50).mean()
@@ -114,40 +242,19 @@ def calculate_technical_indicators(df):
     df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
     
     # Bollinger Bands
-    df['BB_middle'] = df['close'].rolling(window=20).mean()
-    df['BB_upper'] = df['BB_middle'] + 2 * df['close'].rolling(window=20).std()
-    df['BB_lower'] = df['BB_middle'] - 2 * df['close'].rolling(window=20).std()
+    rolling_std = df['close'].rolling(window=20).std()
+    df['BB_middle'] = df['SMA_20']
+    df['BB_upper'] = df['BB_middle'] + 2 * rolling_std
+    df['BB_lower'] = df['BB_middle'] - 2 * rolling_std
     
     return df
 
 def get_analysis_system_prompt(symbol, data=None):
-    prompt = f"""You are FinAI's stock analysis expert. Analyze the stock {symbol} based on available data.
-    
-    Provide a comprehensive analysis including:
-    1. Overview of the company and its business model
-    2. Recent performance and key metrics
-    3. Technical analysis (if applicable)
-    4. Fundamental analysis (if applicable)
-    5. Industry context and competitive positioning
-    6. Potential risks and opportunities
-    7. General outlook (bullish, neutral, or bearish)
-    
-    Important guidelines:
-    - Make it clear you are providing educational analysis, not financial advice
-    - Present a balanced view that covers both bullish and bearish perspectives
-    - Do not make specific price predictions or guarantees
-    - Acknowledge limitations in your analysis based on available data
-    - Focus on facts and objective analysis
-    - Use standard financial terminology and explain complex concepts
-    
-    """
-    
-    if data:
-        prompt += f"Here is the available data for {symbol}: {json.dumps(data)}\n\n"
-    
-    prompt += "Provide your analysis in a clear, structured format that would be helpful for an investor wanting to understand this stock better."
-    
-    return prompt
+    """Compact, token-budgeted system prompt; returns (prompt, estimated_tokens)"""
+    prompt, tokens, dropped = build_analysis_prompt(symbol, data)
+    if dropped:
+        current_app.logger.info(f"Analysis prompt for {symbol} dropped {dropped} data lines to fit the token budget")
+    return prompt, tokens
 
 def generate_mock_analysis(symbol):
     """Generate mock stock analysis when Groq API is unavailable"""
@@ -286,104 +393,384 @@ def generate_mock_analysis(symbol):
         'analysis': full_analysis,
         'sentiment': sentiment,
         'generated_at': datetime.now().isoformat(),
-        'source': 'Mock Analysis Engine'
+        'source': 'Mock Analysis Engine',
+        'cached': False
     }
 
-@analysis_bp.route('/stock/<symbol>', methods=['GET'])
-@jwt_required()
-def analyze_stock(symbol):
-    """Get AI analysis for a specific stock"""
-    if not symbol:
-        return jsonify({'error': 'No symbol provided'}), 400
-    
-    symbol = symbol.upper()
+def prepare_analysis_request(symbol, stock_data, metadata):
+    """Build the completion messages; returns (messages, prompt_version, fingerprint)"""
+    system_prompt, system_tokens = get_analysis_system_prompt(symbol, stock_data)
+    user_prompt = f"Please provide a comprehensive analysis of {symbol} stock."
+    metadata['prompt_tokens'] = system_tokens + estimate_tokens(user_prompt)
+    
+    prompt_version = f'{PROMPT_VERSION}/{ANALYSIS_PROMPT_TOKEN_BUDGET}'
+    fingerprint = analysis_fingerprint(symbol, prompt_version, stock_data, ANALYSIS_MODEL)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    return messages, prompt_version, fingerprint
+
+def create_analysis_completion(client, messages, stream):
+    return client.chat.completions.create(
+        messages=messages,
+        model=ANALYSIS_MODEL,  # Using Llama 3 70B model
+        temperature=0.7,
+        max_tokens=2000,
+        top_p=0.9,
+        stream=stream
+    )
+
+def build_analysis_result(symbol, analysis_text):
+    # Determine sentiment from analysis (very basic approach)
+    sentiment = "Neutral"  # Default
+    if "bullish" in analysis_text.lower():
+        sentiment = "Bullish"
+    elif "bearish" in analysis_text.lower():
+        sentiment = "Bearish"
     
+    return {
+        'symbol': symbol,
+        'analysis': analysis_text,
+        'sentiment': sentiment,
+        'generated_at': datetime.now().isoformat(),
+        'source': 'Groq LLM Analysis'
+    }
+
+def get_analysis_groq_key():
+    """Return the Groq API key, or None (with a warning) when analyses must use the mock"""
+    groq_api_key = os.environ.get('GROQ_API_KEY')
+    if not groq_api_key or groq_api_key.startswith('placeholder'):
+        current_app.logger.warning("Groq API key not found or invalid. Using mock analysis.")
+        return None
+    return groq_api_key
+
+# The mock analysis reads no market data, so nothing is gathered for it
+MOCK_ANALYSIS_METADATA = {'sources': {}, 'gather_ms': 0.0}
+
+def run_stock_analysis(symbol):
+    """Gather data for symbol and return its analysis, falling back to mock analysis"""
     try:
-        # First, try to get stock data from Alpha Vantage
-        stock_data = None
-        api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
-        
-        if api_key:
-            # Get overview data
-            overview_url = f'https://www.alphavantage.co/query?function=OVERVIEW&symbol={symbol}&apikey={api_key}'
-            overview_response = requests.get(overview_url)
-            overview_data = overview_response.json()
-            
-            # Get global quote
-            quote_url = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}'
-            quote_response = requests.get(quote_url)
-            quote_data = quote_response.json()
-            
-            # Combine data if valid
-            if 'Symbol' in overview_data and 'Global Quote' in quote_data:
-                stock_data = {
-                    'overview': overview_data,
-                    'quote': quote_data['Global Quote']
-                }
-        
-        # Get Groq API key
-        groq_api_key = os.environ.get('GROQ_API_KEY')
-        
         # If Groq API key is not available or invalid, use mock analysis
-        if not groq_api_key or groq_api_key.startswith('placeholder'):
-            current_app.logger.warning("Groq API key not found or invalid. Using mock analysis.")
+        groq_api_key = get_analysis_groq_key()
+        if not groq_api_key:
             mock_result = generate_mock_analysis(symbol)
-            return jsonify(mock_result), 200
+            mock_result['metadata'] = dict(MOCK_ANALYSIS_METADATA)
+            return mock_result
         
-        # Initialize Groq client
-        client = groq.Client(api_key=groq_api_key)
+        # Fetch every input at once; a slow or failing source is left out
+        stock_data, metadata = gather_stock_data(symbol)
         
-        # Get user identity for context
-        user_id = get_jwt_identity()
+        messages, prompt_version, fingerprint = prepare_analysis_request(symbol, stock_data, metadata)
         
-        # Prepare chat completion request
-        system_prompt = get_analysis_system_prompt(symbol, stock_data)
+        # Same symbol, prompt, data and model: serve the stored analysis
+        cached = get_cached_analysis(fingerprint)
+        if cached:
+            cached['cached'] = True
+            cached['metadata'] = metadata
+            return cached
+
+        # Initialize Groq client
+        client = get_groq_client(groq_api_key)
         
-        # Create messages array with system prompt
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Please provide a comprehensive analysis of {symbol} stock."}
-        ]
+        def generate():
+            upstream.acquire('groq')
+            chat_completion = create_analysis_completion(client, messages, stream=False)
+            
+            # Extract response
+            result = build_analysis_result(symbol, chat_completion.choices[0].message.content)
+            # What the model actually counted, to check the local estimate against
+            usage = getattr(chat_completion, 'usage', None)
+            if usage is not None:
+                result['usage'] = {
+                    'prompt_tokens': usage.prompt_tokens,
+                    'completion_tokens': usage.completion_tokens
+                }
+            store_analysis(fingerprint, symbol, ANALYSIS_MODEL, prompt_version, result)
+            return result
         
         # Make request to Groq API
         try:
-            chat_completion = client.chat.completions.create(
-                messages=messages,
-                model="llama3-70b-8192",  # Using Llama 3 70B model
-                temperature=0.7,
-                max_tokens=2000,
-                top_p=0.9,
-                stream=False
-            )
-            
-            # Extract response
-            analysis_text = chat_completion.choices[0].message.content
-            
-            # Determine sentiment from analysis (very basic approach)
-            sentiment = "Neutral"  # Default
-            if "bullish" in analysis_text.lower():
-                sentiment = "Bullish"
-            elif "bearish" in analysis_text.lower():
-                sentiment = "Bearish"
-            
-            result = {
-                'symbol': symbol,
-                'analysis': analysis_text,
-                'sentiment': sentiment,
-                'generated_at': datetime.now().isoformat(),
-                'source': 'Groq LLM Analysis'
-            }
-            
-            return jsonify(result), 200
+            # Concurrent requests for the same fingerprint wait for one completion
+            return dict(analysis_flight.do(fingerprint, generate), cached=False, metadata=metadata)
             
         except Exception as e:
             current_app.logger.error(f"Error from Groq API: {str(e)}")
             # Fall back to mock analysis
             mock_result = generate_mock_analysis(symbol)
-            return jsonify(mock_result), 200
+            mock_result['metadata'] = metadata
+            return mock_result
         
     except Exception as e:
         current_app.logger.error(f"Error in stock analysis: {str(e)}")
         # Return mock analysis as fallback
         mock_result = generate_mock_analysis(symbol)
-        return jsonify(mock_result), 200 
\ No newline at end of file
+        return mock_result
+
+@analysis_bp.route('/stock/<symbol>', methods=['GET'])
+@jwt_required()
+def analyze_stock(symbol):
+    """Get AI analysis for a specific stock"""
+    if not symbol:
+        return jsonify({'error': 'No symbol provided'}), 400
+    
+    return jsonify(run_stock_analysis(symbol.upper())), 200
+
+@analysis_bp.route('/stock/<symbol>/stream', methods=['GET'])
+@jwt_required()
+def analyze_stock_stream(symbol):
+    """Stream an AI analysis as Server-Sent Events: metadata, tokens, then the final result"""
+    symbol = symbol.upper()
+    
+    def done(result):
+        # The client already has the text from the token events
+        return format_sse({key: value for key, value in result.items() if key != 'analysis'}, event='done')
+    
+    def stream_result(result):
+        # Cached analyses go out in one piece; mock ones stream word by word like a live model
+        if result.get('cached'):
+            yield format_sse({'text': result['analysis']}, event='token')
+        else:
+            for text in iter_words(result['analysis']):
+                yield format_sse({'text': text}, event='token')
+        yield done(result)
+    
+    def generate():
+        groq_api_key = get_analysis_groq_key()
+        if not groq_api_key:
+            yield format_sse(MOCK_ANALYSIS_METADATA, event='metadata')
+            yield from stream_result(generate_mock_analysis(symbol))
+            return
+        
+        stock_data, metadata = gather_stock_data(symbol)
+        messages, prompt_version, fingerprint = prepare_analysis_request(symbol, stock_data, metadata)
+        yield format_sse(metadata, event='metadata')
+        
+        cached = get_cached_analysis(fingerprint)
+        if cached:
+            cached['cached'] = True
+            yield from stream_result(cached)
+            return
+        
+        parts = []
+        try:
+            upstream.acquire('groq')
+            stream = create_analysis_completion(get_groq_client(groq_api_key), messages, stream=True)
+            for text in iter_completion_deltas(stream):
+                parts.append(text)
+                yield format_sse({'text': text}, event='token')
+        except Exception as e:
+            current_app.logger.error(f"Error from Groq API: {str(e)}")
+            if parts:
+                yield format_sse({'error': str(e)}, event='error')
+                return
+            # Nothing was sent yet, so the mock analysis can stand in
+            yield from stream_result(generate_mock_analysis(symbol))
+            return
+        
+        # Store only complete analyses
+        result = build_analysis_result(symbol, ''.join(parts))
+        store_analysis(fingerprint, symbol, ANALYSIS_MODEL, prompt_version, result)
+        yield done(dict(result, cached=False))
+    
+    return sse_response(stream_with_context(generate()))
+
+@analysis_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def submit_analysis_job():
+    """Queue a stock analysis and return its job id right away"""
+    data = request.get_json(silent=True) or {}
+    symbol = (data.get('symbol') or '').strip().upper()
+    if not symbol:
+        return jsonify({'error': 'No symbol provided'}), 400
+
+    try:
+        # A queued or running analysis of the same symbol is shared, not repeated
+        job, created = analysis_jobs.submit(
+            f'stock:{symbol}', run_stock_analysis, symbol, owner=get_jwt_identity()
+        )
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+
+    response = jsonify(job.to_dict())
+    response.headers['Location'] = f'/api/analysis/jobs/{job.id}'
+    return response, 202 if created else 200
+
+@analysis_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_analysis_job(job_id):
+    """Poll a job; ?wait=<seconds> blocks until it finishes or the wait runs out"""
+    # Other users' jobs look the same as missing ones
+    job = analysis_jobs.get(job_id, owner=get_jwt_identity())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    try:
+        wait = min(float(request.args.get('wait', 0)), ANALYSIS_JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number'}), 400
+    if wait > 0:
+        job.finished.wait(wait)
+
+    return jsonify(job.to_dict()), 200
+
+def _series(values):
+    # NaN (indicator still warming up) isn't valid JSON
+    return [None if np.isnan(value) else round(value, 4) for value in values.tolist()]
+
+@analysis_bp.route('/indicators/<symbol>', methods=['GET'])
+@jwt_required()
+def get_indicators(symbol):
+    """Get technical indicator series for a symbol from its stored daily bars"""
+    symbol = symbol.upper()
+
+    requested = request.args.get('indicators')
+    names = INDICATOR_NAMES if not requested else tuple(sorted({
+        name.strip().lower() for name in requested.split(',') if name.strip()
+    }))
+    unknown = [name for name in names if name not in INDICATOR_NAMES]
+    if unknown:
+        return jsonify({'error': f"Unknown indicators: {', '.join(unknown)}", 'available': list(INDICATOR_NAMES)}), 400
+
+    try:
+        lookback = int(request.args.get('lookback', INDICATORS_DEFAULT_LOOKBACK))
+    except ValueError:
+        return jsonify({'error': 'lookback must be an integer'}), 400
+    if not 1 <= lookback <= INDICATORS_MAX_LOOKBACK:
+        return jsonify({'error': f'lookback must be between 1 and {INDICATORS_MAX_LOOKBACK}'}), 400
+
+    try:
+        bars = get_daily_bars(symbol)
+    except LookupError:
+        return jsonify({'error': 'Historical data not found'}), 404
+    except UpstreamError as e:
+        return jsonify({'error': f'Market data temporarily unavailable: {str(e)}'}), 503
+    except Exception as e:
+        current_app.logger.error(f"Error getting bars for indicators: {str(e)}")
+        return jsonify({'error': 'Failed to fetch historical data'}), 500
+
+    if not len(bars):
+        return jsonify({'error': 'Historical data not found'}), 404
+
+    def load():
+        dates, columns = compute_indicators(bars, names, lookback)
+        return {
+            'symbol': symbol,
+            'as_of': str(dates[-1]),
+            'lookback': len(dates),
+            'dates': [str(date) for date in dates],
+            'indicators': {name: _series(values) for name, values in columns.items()}
+        }
+
+    # A new bar changes the last date and with it the key, so stale series are never served
+    key = f"{symbol}:{bars['date'][-1]}:{','.join(names)}:{lookback}"
+    result, cache_status = indicator_cache.get_or_load(key, load)
+
+    response = jsonify(result)
+    response.headers['X-Cache'] = cache_status.upper()
+    return response, 200
+
+def _metric(value):
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value, 4)
+
+@analysis_bp.route('/backtest', methods=['POST'])
+@jwt_required()
+def run_backtest():
+    """Backtest a strategy over stored daily bars, sweeping its parameter grid"""
+    data = request.get_json(silent=True) or {}
+
+    symbols = data.get('symbols') or []
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    symbols = list(dict.fromkeys(str(symbol).strip().upper() for symbol in symbols if str(symbol).strip()))
+    if not symbols:
+        return jsonify({'error': 'No symbols provided'}), 400
+    if len(symbols) > BACKTEST_MAX_SYMBOLS:
+        return jsonify({'error': f'At most {BACKTEST_MAX_SYMBOLS} symbols per backtest'}), 400
+
+    strategy = data.get('strategy', 'sma_crossover')
+    if strategy not in STRATEGIES:
+        return jsonify({'error': f'Unknown strategy: {strategy}', 'available': list(STRATEGIES)}), 400
+
+    # Omitted parameters keep their default sweep values; scalars pin a parameter
+    grid = dict(STRATEGIES[strategy][1])
+    for name, values in (data.get('grid') or data.get('params') or {}).items():
+        if name not in grid:
+            return jsonify({'error': f'Unknown parameter for {strategy}: {name}'}), 400
+        values = values if isinstance(values, list) else [values]
+        if not values or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            return jsonify({'error': f'{name} must be a number or a list of numbers'}), 400
+        if name in ('lower', 'upper'):
+            # RSI thresholds may be fractional but must be on the RSI scale
+            if not all(0 <= value <= 100 for value in values):
+                return jsonify({'error': f'{name} must be between 0 and 100'}), 400
+        elif not all(float(value).is_integer() and value >= 1 for value in values):
+            # Periods size rolling windows, so they must be whole and positive
+            return jsonify({'error': f'{name} must be a positive integer'}), 400
+        grid[name] = [value if name in ('lower', 'upper') else int(value) for value in values]
+
+    combinations = int(np.prod([len(values) for values in grid.values()]))
+    if combinations > BACKTEST_MAX_COMBINATIONS:
+        return jsonify({'error': f'At most {BACKTEST_MAX_COMBINATIONS} parameter combinations per backtest'}), 400
+
+    try:
+        days = int(data.get('days', BACKTEST_DEFAULT_DAYS))
+        cost_bps = float(data.get('cost_bps', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'days and cost_bps must be numbers'}), 400
+    if days < 2:
+        return jsonify({'error': 'days must be at least 2'}), 400
+
+    # Read what the bar store already holds; only fetch missing symbols when asked to
+    series = {}
+    missing = []
+    for symbol in symbols:
+        bars = ohlcv_store.read(symbol)
+        if not len(bars) and data.get('sync'):
+            try:
+                bars = get_daily_bars(symbol)
+            except Exception as e:
+                current_app.logger.warning(f"Backtest could not load bars for {symbol}: {str(e)}")
+        if len(bars) >= 2:
+            series[symbol] = bars
+        else:
+            missing.append(symbol)
+
+    if not series:
+        return jsonify({'error': 'No stored history for the requested symbols', 'missing': missing}), 404
+
+    loaded, dates, closes = align_closes(series)
+    dates, closes = dates[-days:], closes[:, -days:]
+
+    try:
+        report = sweep(closes, strategy, grid, cost_bps)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Backtest failed: {str(e)}")
+        return jsonify({'error': 'Backtest failed'}), 500
+
+    best = report['best']
+    report['best'] = {
+        'params': best['params'],
+        'symbols': {
+            symbol: {
+                name: int(values[i]) if name == 'trades' else _metric(values[i])
+                for name, values in best['metrics'].items()
+            }
+            for i, symbol in enumerate(loaded)
+        }
+    }
+    for summary in report['results']:
+        for name, value in summary.items():
+            if name not in ('params', 'trades'):
+                summary[name] = _metric(value)
+
+    report.update({
+        'start': str(dates[0]),
+        'end': str(dates[-1]),
+        'cost_bps': cost_bps,
+        'missing': missing
+    })
+    return jsonify(report), 200
@@ -1,13 +1,13 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import ChatSession, ChatMessage, db
+from ..upstream import upstream, get_groq_client
+from ..streaming import format_sse, sse_response, iter_words, iter_completion_deltas, iter_sse_deltas
 import os
 import uuid
-import requests
 import json
 from PyPDF2 import PdfReader
 import io
-import groq
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
@@ -66,7 +66,7 @@ class GroqClient:
             "Content-Type": "application/json"
         }
     
-    def generate_response(self, user_message, context=None):
+    def build_messages(self, user_message, context=None):
         messages = []
         
         # Add system message
@@ -88,15 +88,23 @@ class GroqClient:
             "content": user_message
         })
         
+        return messages
+    
+    def build_payload(self, user_message, context=None, stream=False):
+        return {
+            "model": "llama3-8b-8192",  # Using Llama 3 8B model
+            "messages": self.build_messages(user_message, context),
+            "temperature": 0.7,
+            "max_tokens": 1024,
+            "stream": stream
+        }
+    
+    def generate_response(self, user_message, context=None):
         try:
-            payload = {
-                "model": "llama3-8b-8192",  # Using Llama 3 8B model
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1024
-            }
+            payload = self.build_payload(user_message, context)
             
-            response = requests.post(
+            response = upstream.post(
+                'groq',
                 self.base_url,
                 headers=self.headers,
                 data=json.dumps(payload)
@@ -111,6 +119,26 @@ class GroqClient:
         
         except Exception as e:
             return f"I apologize for the inconvenience. There was an error processing your request: {str(e)}"
+    
+    def stream_response(self, user_message, context=None):
+        """Yield the response text as it arrives"""
+        try:
+            response = upstream.post(
+                'groq',
+                self.base_url,
+                headers=self.headers,
+                data=json.dumps(self.build_payload(user_message, context, stream=True)),
+                stream=True
+            )
+        except Exception as e:
+            yield f"I apologize for the inconvenience. There was an error processing your request: {str(e)}"
+            return
+        
+        with response:
+            if response.status_code != 200:
+                yield f"I apologize, but I'm having trouble connecting to my knowledge base right now. Error: {response.status_code}"
+                return
+            yield from iter_sse_deltas(response)
 
 # Initialize the real Groq client if API key exists, otherwise use mock client
 if GROQ_API_KEY:
@@ -120,6 +148,9 @@ else:
     class MockGroqClient:
         def generate_response(self, user_message, context=None):
             return f"This is a mock response to: '{user_message}'. Please set the GROQ_API_KEY environment variable for real responses."
+        
+        def stream_response(self, user_message, context=None):
+            yield from iter_words(self.generate_response(user_message, context))
     
     groq_client = MockGroqClient()
 
@@ -191,49 +222,13 @@ def chat():
         return jsonify({'error': 'Missing message field'}), 400
     
     try:
-        # Get session ID or create a new one
-        session_id = data.get('session_id')
-        if not session_id:
-            # Create a new session
-            current_user_id = get_jwt_identity()
-            session = ChatSession(
-                user_id=current_user_id,
-                session_id=str(uuid.uuid4())
-            )
-            db.session.add(session)
-            db.session.commit()
-            session_id = session.session_id
-        
-        # Store user message
-        user_message = ChatMessage(
-            session_id=session_id,
-            message=data['message'],
-            is_user=True
-        )
-        db.session.add(user_message)
-        db.session.commit()
-        
-        # Get context from previous messages if available
-        context = None
-        previous_messages = ChatMessage.query.filter_by(
-            session_id=session_id,
-            is_user=False
-        ).order_by(ChatMessage.timestamp.desc()).first()
-        
-        if previous_messages and len(previous_messages.message) > 1000:
-            context = previous_messages.message[:1000] + "..."
+        session_id, context = start_chat_turn(data)
         
         # Get response from Groq
         assistant_response = groq_client.generate_response(data['message'], context)
         
         # Store assistant response
-        assistant_message = ChatMessage(
-            session_id=session_id,
-            message=assistant_response,
-            is_user=False
-        )
-        db.session.add(assistant_message)
-        db.session.commit()
+        save_assistant_message(session_id, assistant_response)
         
         return jsonify({
             'response': assistant_response,
@@ -244,6 +239,88 @@ def chat():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def start_chat_turn(data):
+    """Store the user's message, creating a session if needed; returns (session_id, context)"""
+    # Get session ID or create a new one
+    session_id = data.get('session_id')
+    if not session_id:
+        # Create a new session
+        current_user_id = get_jwt_identity()
+        session = ChatSession(
+            user_id=current_user_id,
+            session_id=str(uuid.uuid4())
+        )
+        db.session.add(session)
+        db.session.commit()
+        session_id = session.session_id
+    
+    # Store user message
+    user_message = ChatMessage(
+        session_id=session_id,
+        message=data['message'],
+        is_user=True
+    )
+    db.session.add(user_message)
+    db.session.commit()
+    
+    # Get context from previous messages if available
+    context = None
+    previous_messages = ChatMessage.query.filter_by(
+        session_id=session_id,
+        is_user=False
+    ).order_by(ChatMessage.timestamp.desc()).first()
+    
+    if previous_messages and len(previous_messages.message) > 1000:
+        context = previous_messages.message[:1000] + "..."
+    
+    return session_id, context
+
+def save_assistant_message(session_id, text):
+    assistant_message = ChatMessage(
+        session_id=session_id,
+        message=text,
+        is_user=False
+    )
+    db.session.add(assistant_message)
+    db.session.commit()
+
+@chatbot_bp.route('/chat/stream', methods=['POST'])
+@jwt_required()
+def chat_stream():
+    """Like /chat, but relays the response as Server-Sent Events while it is generated"""
+    data = request.get_json()
+    if not 'message' in data:
+        return jsonify({'error': 'Missing message field'}), 400
+    
+    try:
+        session_id, context = start_chat_turn(data)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        yield format_sse({'session_id': session_id}, event='start')
+        parts = []
+        try:
+            for text in groq_client.stream_response(data['message'], context):
+                parts.append(text)
+                yield format_sse({'text': text}, event='token')
+        except Exception as e:
+            current_app.logger.error(f"Error streaming chat response: {str(e)}")
+            yield format_sse({'error': str(e)}, event='error')
+        
+        # Persist once the stream has finished, partial or not
+        response_text = ''.join(parts)
+        if response_text:
+            try:
+                save_assistant_message(session_id, response_text)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Error saving streamed chat response: {str(e)}")
+        yield format_sse({'session_id': session_id, 'response': response_text}, event='done')
+    
+    return sse_response(stream_with_context(generate()))
+
 @chatbot_bp.route('/history/<session_id>', methods=['GET'])
 @jwt_required()
 def get_chat_history(session_id):
@@ -265,6 +342,34 @@ def get_chat_history(session_id):
     
     return jsonify(history), 200
 
+def build_chat_messages(message):
+    # Get user's message history (simplified version - would be expanded with database integration)
+    # In a real implementation, you would retrieve previous messages from a database
+    message_history = []
+    
+    # Create messages array with system prompt and user message
+    messages = [
+        {"role": "system", "content": get_system_prompt()}
+    ]
+    
+    # Add message history if available
+    for msg in message_history:
+        messages.append(msg)
+    
+    # Add current user message
+    messages.append({"role": "user", "content": message})
+    return messages
+
+def create_message_completion(client, message, stream):
+    return client.chat.completions.create(
+        messages=build_chat_messages(message),
+        model="llama3-70b-8192",  # Using Llama 3 70B model
+        temperature=0.7,
+        max_tokens=800,
+        top_p=0.9,
+        stream=stream
+    )
+
 @chatbot_bp.route('/message', methods=['POST'])
 @jwt_required()
 def send_message():
@@ -284,39 +389,11 @@ def send_message():
             return jsonify({'response': response}), 200
         
         # Initialize Groq client
-        client = groq.Client(api_key=api_key)
-        
-        # Get user identity for context
-        user_id = get_jwt_identity()
-        
-        # Get user's message history (simplified version - would be expanded with database integration)
-        # In a real implementation, you would retrieve previous messages from a database
-        message_history = []
-        
-        # Prepare chat completion request
-        system_prompt = get_system_prompt()
-        
-        # Create messages array with system prompt and user message
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-        
-        # Add message history if available
-        for msg in message_history:
-            messages.append(msg)
-        
-        # Add current user message
-        messages.append({"role": "user", "content": message})
+        client = get_groq_client(api_key)
         
         # Make request to Groq API
-        chat_completion = client.chat.completions.create(
-            messages=messages,
-            model="llama3-70b-8192",  # Using Llama 3 70B model
-            temperature=0.7,
-            max_tokens=800,
-            top_p=0.9,
-            stream=False
-        )
+        upstream.acquire('groq')
+        chat_completion = create_message_completion(client, message, stream=False)
         
         # Extract response
         response = chat_completion.choices[0].message.content
@@ -330,4 +407,41 @@ def send_message():
         current_app.logger.error(f"Error in chatbot: {str(e)}")
         # Provide a fallback response
         fallback_response = get_basic_response(message)
-        return jsonify({'response': fallback_response}), 200 
\ No newline at end of file
+        return jsonify({'response': fallback_response}), 200 
+
+@chatbot_bp.route('/message/stream', methods=['POST'])
+@jwt_required()
+def send_message_stream():
+    """Like /message, but relays the response as Server-Sent Events while it is generated"""
+    data = request.get_json()
+    message = data.get('message', '')
+    
+    if not message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    def completion_chunks():
+        api_key = os.environ.get('GROQ_API_KEY')
+        if not api_key:
+            current_app.logger.warning("Groq API key not found. Using fallback response.")
+            yield from iter_words(get_basic_response(message))
+            return
+        upstream.acquire('groq')
+        yield from iter_completion_deltas(create_message_completion(get_groq_client(api_key), message, stream=True))
+    
+    def generate():
+        sent = False
+        try:
+            for text in completion_chunks():
+                sent = True
+                yield format_sse({'text': text}, event='token')
+        except Exception as e:
+            current_app.logger.error(f"Error in chatbot stream: {str(e)}")
+            if sent:
+                yield format_sse({'error': str(e)}, event='error')
+            else:
+                # Nothing reached the client yet, so the fallback can stand in for the answer
+                for text in iter_words(get_basic_response(message)):
+                    yield format_sse({'text': text}, event='token')
+        yield format_sse({}, event='done')
+    
+    return sse_response(stream_with_context(generate()))
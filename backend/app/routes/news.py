@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, current_app
 from flask_jwt_extended import jwt_required
+from ..upstream import upstream
 import os
-import requests
 from datetime import datetime, timedelta
 import random
 
@@ -185,8 +185,7 @@ def get_latest_news():
         api_key = os.environ.get('NEWS_API_KEY')
         if api_key:
             url = f'https://newsapi.org/v2/top-headlines?category=business&language=en&apiKey={api_key}'
-            response = requests.get(url)
-            data = response.json()
+            data = upstream.get_json('newsapi', url)
             
             if data.get('status') == 'ok' and data.get('articles'):
                 articles = []
@@ -204,8 +203,7 @@ def get_latest_news():
         finnhub_key = os.environ.get('FINNHUB_API_KEY')
         if finnhub_key:
             url = f'https://finnhub.io/api/v1/news?category=general&token={finnhub_key}'
-            response = requests.get(url)
-            data = response.json()
+            data = upstream.get_json('finnhub', url)
             
             if data and isinstance(data, list):
                 articles = []
@@ -237,8 +235,7 @@ def search_news(query):
         api_key = os.environ.get('NEWS_API_KEY')
         if api_key:
             url = f'https://newsapi.org/v2/everything?q={query}&language=en&sortBy=publishedAt&apiKey={api_key}'
-            response = requests.get(url)
-            data = response.json()
+            data = upstream.get_json('newsapi', url)
             
             if data.get('status') == 'ok' and data.get('articles'):
                 articles = []
@@ -256,8 +253,7 @@ def search_news(query):
         finnhub_key = os.environ.get('FINNHUB_API_KEY')
         if finnhub_key:
             url = f'https://finnhub.io/api/v1/news?category=general&token={finnhub_key}'
-            response = requests.get(url)
-            data = response.json()
+            data = upstream.get_json('finnhub', url)
             
             if data and isinstance(data, list):
                 # Filter to find relevant articles
@@ -304,8 +300,7 @@ def get_company_news(symbol):
             'token': FINNHUB_API_KEY
         }
         
-        response = requests.get(url, params=params)
-        news_items = response.json()
+        news_items = upstream.get_json('finnhub', url, params=params)
         
         if not isinstance(news_items, list) or not news_items:
             # Return mock data if API fails
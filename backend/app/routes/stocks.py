@@ -1,11 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models import User, StockHolding, Transaction, db
+from ..models import User, StockHolding, Transaction, PositionLedger, db
+from ..market_data import (
+    get_quote, get_quotes, get_daily_bars, get_intraday, generate_mock_quote, search_symbols,
+    quote_provider_stats, quote_cache, search_cache, quote_hub, intraday_cache,
+    QUOTE_BATCH_MAX_SYMBOLS, INTRADAY_INTERVALS
+)
+from ..streaming import format_sse, sse_response
+from ..indicators import indicator_cache
+from ..jobs import analysis_jobs
+from ..symbol_index import symbol_universe
+from ..upstream import upstream, UpstreamError
+from ..trading import parse_order, execute_order, TradeError, MAX_ORDERS_PER_REQUEST
+from ..trade_import import import_trades, iter_trade_rows
 import os
-import requests
 from datetime import datetime
-import random  # Add this for fallback data
 import hashlib
+import queue
+import base64
+import binascii
+import numpy as np
+from sqlalchemy import tuple_
 
 stocks_bp = Blueprint('stocks', __name__)
 
@@ -17,147 +32,140 @@ FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY')
 def get_stock_quote(symbol):
     """Get real-time stock price quote"""
     try:
-        # First try Alpha Vantage API
-        api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
-        if api_key:
-            url = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}'
-            response = requests.get(url)
-            data = response.json()
-            
-            if 'Global Quote' in data and data['Global Quote']:
-                quote = data['Global Quote']
-                result = {
-                    'symbol': symbol,
-                    'price': float(quote.get('05. price', 0)),
-                    'change': float(quote.get('09. change', 0)),
-                    'change_percent': float(quote.get('10. change percent', '0%').replace('%', '')),
-                    'volume': int(quote.get('06. volume', 0)),
-                    'latest_trading_day': quote.get('07. latest trading day', datetime.now().strftime('%Y-%m-%d')),
-                    'source': 'Alpha Vantage'
-                }
-                return jsonify(result), 200
-            
-        # If Alpha Vantage fails or limits reached, try Finnhub
-        finnhub_key = os.environ.get('FINNHUB_API_KEY')
-        if finnhub_key:
-            url = f'https://finnhub.io/api/v1/quote?symbol={symbol}&token={finnhub_key}'
-            response = requests.get(url)
-            data = response.json()
-            
-            if data and 'c' in data:
-                result = {
-                    'symbol': symbol,
-                    'price': float(data.get('c', 0)),
-                    'change': float(data.get('d', 0)),
-                    'change_percent': float(data.get('dp', 0)),
-                    'high': float(data.get('h', 0)),
-                    'low': float(data.get('l', 0)),
-                    'volume': int(data.get('v', 0)),
-                    'latest_trading_day': datetime.fromtimestamp(data.get('t', 0)).strftime('%Y-%m-%d'),
-                    'source': 'Finnhub'
-                }
-                return jsonify(result), 200
-        
-        # If both APIs fail or limits reached, use mock data
-        return generate_mock_data(symbol)
-            
+        quote, cache_status = get_quote(symbol)
     except Exception as e:
         current_app.logger.error(f"Error getting stock quote: {str(e)}")
         # Fallback to mock data if there's any error
-        return generate_mock_data(symbol)
-
-def generate_mock_data(symbol):
-    """Generate mock data when API fails or limits are reached"""
-    # Use predefined realistic values for popular stocks
-    popular_stocks = {
-        'AAPL': {'price': 175.64, 'change': 2.32, 'name': 'Apple Inc.', 'volume': 78523641},
-        'MSFT': {'price': 380.32, 'change': 4.21, 'name': 'Microsoft Corporation', 'volume': 32458726},
-        'GOOGL': {'price': 142.93, 'change': 1.56, 'name': 'Alphabet Inc.', 'volume': 25843197},
-        'AMZN': {'price': 169.45, 'change': -0.87, 'name': 'Amazon.com Inc.', 'volume': 41236548},
-        'META': {'price': 458.32, 'change': 5.43, 'name': 'Meta Platforms Inc.', 'volume': 19876543},
-        'TSLA': {'price': 193.57, 'change': -2.31, 'name': 'Tesla Inc.', 'volume': 57234891},
-        'NVDA': {'price': 788.14, 'change': 12.47, 'name': 'NVIDIA Corporation', 'volume': 45213698}
-    }
-    
-    # If the symbol is one of our predefined stocks, use that data
-    if symbol in popular_stocks:
-        base_price = popular_stocks[symbol]['price']
-        change = popular_stocks[symbol]['change']
-        name = popular_stocks[symbol]['name']
-        volume = popular_stocks[symbol]['volume']
-    else:
-        # For other stocks, generate pseudo-random but deterministic data based on symbol
-        # Simple hash function based on ASCII values
-        symbol_seed = sum(ord(c) for c in symbol)
-        random.seed(symbol_seed)
-        
-        base_price = 100 + (symbol_seed % 900)
-        change = round(random.uniform(-5, 5), 2)
-        name = f"{symbol} Inc."
-        volume = random.randint(100000, 10000000)
-    
-    change_percent = round((change / base_price) * 100, 2)
-    
-    # Generate realistic high and low
-    high = base_price + abs(change) * 1.1
-    low = base_price - abs(change) * 0.9
-    
-    mock_data = {
-        'symbol': symbol,
-        'name': name,
-        'price': base_price,
-        'change': change,
-        'change_percent': change_percent,
-        'volume': volume,
-        'high': high,
-        'low': low,
-        'market_cap': base_price * volume,
-        'latest_trading_day': datetime.now().strftime('%Y-%m-%d')
-    }
-    
-    return jsonify(mock_data), 200
+        quote, cache_status = generate_mock_quote(symbol.upper()), 'miss'
+
+    response = jsonify(quote)
+    response.headers['X-Cache'] = cache_status.upper()
+    return response, 200
+
+@stocks_bp.route('/quotes', methods=['GET'])
+@jwt_required()
+def get_stock_quotes():
+    """Get quotes for a comma-separated list of symbols in one round trip"""
+    symbols = [s.strip() for s in request.args.get('symbols', '').split(',') if s.strip()]
+
+    if not symbols:
+        return jsonify({'error': 'No symbols provided'}), 400
+
+    if len(symbols) > QUOTE_BATCH_MAX_SYMBOLS:
+        return jsonify({'error': f'At most {QUOTE_BATCH_MAX_SYMBOLS} symbols per request'}), 400
+
+    quotes = get_quotes(symbols)
+
+    return jsonify({
+        'quotes': quotes,
+        'count': len(quotes),
+        'errors': sum(1 for q in quotes if q['error'])
+    }), 200
+
+STREAM_HEARTBEAT_SECONDS = 15
+
+@stocks_bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream_quotes():
+    """Stream live quotes for a comma-separated list of symbols as Server-Sent Events"""
+    symbols = list(dict.fromkeys(s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()))
+
+    if not symbols:
+        return jsonify({'error': 'No symbols provided'}), 400
+
+    if len(symbols) > QUOTE_BATCH_MAX_SYMBOLS:
+        return jsonify({'error': f'At most {QUOTE_BATCH_MAX_SYMBOLS} symbols per stream'}), 400
+
+    subscription = quote_hub.subscribe(symbols)
+
+    def generate():
+        try:
+            yield format_sse({'symbols': symbols}, event='subscribed')
+            while True:
+                try:
+                    symbol, quote = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_sse(quote, event='quote')
+        finally:
+            quote_hub.unsubscribe(subscription)
+
+    return sse_response(generate())
+
+@stocks_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_metrics():
+    """Get cache, quote provider and upstream client counters"""
+    warmer = current_app.extensions.get('cache_warmer')
+    return jsonify({
+        'quote_cache': quote_cache.stats(),
+        'search_cache': search_cache.stats(),
+        'intraday_cache': intraday_cache.stats(),
+        'indicator_cache': indicator_cache.stats(),
+        'quote_providers': quote_provider_stats(),
+        'quote_stream': quote_hub.stats(),
+        'cache_warmer': warmer.last_report if warmer else None,
+        'analysis_jobs': analysis_jobs.stats(),
+        'upstream': upstream.stats(),
+        'single_flight': upstream.single_flight.stats()
+    }), 200
 
 @stocks_bp.route('/search/<query>', methods=['GET'])
 @jwt_required()
 def search_stocks(query):
-    try:
-        url = f'https://www.alphavantage.co/query?function=SYMBOL_SEARCH&keywords={query}&apikey={ALPHA_VANTAGE_API_KEY}'
-        response = requests.get(url)
-        data = response.json()
-        
-        if 'bestMatches' not in data:
+    with_quotes = request.args.get('with_quotes', 'true').lower() != 'false'
+
+    # Answer from the local symbol universe; Alpha Vantage is only the fallback
+    matches = [
+        {
+            'symbol': symbol,
+            'company_name': name,
+            'region': 'United States',
+            'currency': 'USD',
+            'exchange': exchange,
+            'score': score
+        }
+        for (symbol, name, exchange, _), score in symbol_universe.search(query, limit=10)
+    ]
+
+    if not matches:
+        try:
+            best_matches, _ = search_symbols(query)
+        except LookupError:
             return jsonify({'error': 'No search results found'}), 404
-            
-        results = []
-        for match in data['bestMatches'][:10]:  # Limit to 10 results
-            # Get current price using Global Quote for each match
-            symbol = match['1. symbol']
-            quote_url = f'https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}'
-            quote_response = requests.get(quote_url)
-            quote_data = quote_response.json()
-            
-            price = 0
-            change = 0
-            change_percent = 0
-            
-            if 'Global Quote' in quote_data and quote_data['Global Quote']:
-                quote = quote_data['Global Quote']
-                price = float(quote['05. price'])
-                change = float(quote['09. change'])
-                change_percent = float(quote['10. change percent'].rstrip('%'))
-            
-            results.append({
-                'symbol': symbol,
+        except UpstreamError as e:
+            return jsonify({'error': str(e)}), 503
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+        matches = [
+            {
+                'symbol': match['1. symbol'],
                 'company_name': match['2. name'],
                 'region': match['4. region'],
-                'currency': match['8. currency'],
-                'price': price,
-                'change': change,
-                'change_percent': change_percent
-            })
-        
-        return jsonify(results), 200
-        
+                'currency': match['8. currency']
+            }
+            for match in best_matches[:10]  # Limit to 10 results
+        ]
+
+    try:
+        # Enrich every match through the cached batch quote path in one go
+        if with_quotes and matches:
+            quotes = {}
+            for entry in get_quotes([match['symbol'] for match in matches]):
+                if entry['quote']:
+                    quotes[entry['symbol']] = entry['quote']
+
+            for match in matches:
+                quote = quotes.get(match['symbol'].upper(), {})
+                match['price'] = quote.get('price', 0)
+                match['change'] = quote.get('change', 0)
+                match['change_percent'] = quote.get('change_percent', 0)
+
+        return jsonify(matches), 200
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -179,13 +187,131 @@ def get_holdings():
     
     return jsonify(response), 200
 
+def value_portfolio(quantity, average_price, price, change):
+    """Mark positions to market; all arguments are equal-length float arrays"""
+    cost_basis = quantity * average_price
+    market_value = quantity * price
+    unrealized_pnl = market_value - cost_basis
+    day_change = quantity * change
+
+    total_value = np.nansum(market_value)
+    total_cost = np.nansum(cost_basis)
+    total_pnl = np.nansum(unrealized_pnl)
+    total_day_change = np.nansum(day_change)
+    previous_total = total_value - total_day_change
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unrealized_pnl_percent = np.where(cost_basis != 0, unrealized_pnl / cost_basis * 100, np.nan)
+        weights = market_value / total_value if total_value else np.full_like(market_value, np.nan)
+
+    return {
+        'cost_basis': cost_basis,
+        'market_value': market_value,
+        'unrealized_pnl': unrealized_pnl,
+        'unrealized_pnl_percent': unrealized_pnl_percent,
+        'day_change': day_change,
+        'weight': weights
+    }, {
+        'market_value': total_value,
+        'cost_basis': total_cost,
+        'unrealized_pnl': total_pnl,
+        'unrealized_pnl_percent': total_pnl / total_cost * 100 if total_cost else None,
+        'day_change': total_day_change,
+        'day_change_percent': total_day_change / previous_total * 100 if previous_total else None
+    }
+
+def _json_number(value):
+    # NaN (no quote available) isn't valid JSON
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+@stocks_bp.route('/portfolio', methods=['GET'])
+@jwt_required()
+def get_portfolio():
+    """Get a mark-to-market valuation of the user's holdings"""
+    current_user_id = get_jwt_identity()
+
+    holdings = StockHolding.query.filter_by(user_id=current_user_id).all()
+    symbols = [holding.symbol.upper() for holding in holdings]
+
+    quotes = {}
+    if symbols:
+        for entry in get_quotes(symbols):
+            quotes[entry['symbol']] = entry['quote'] or {}
+
+    quantity = np.array([holding.quantity for holding in holdings], dtype=float)
+    average_price = np.array([holding.average_price for holding in holdings], dtype=float)
+    price = np.array([quotes[symbol].get('price', np.nan) for symbol in symbols], dtype=float)
+    change = np.array([quotes[symbol].get('change', np.nan) for symbol in symbols], dtype=float)
+
+    columns, totals = value_portfolio(quantity, average_price, price, change)
+
+    positions = []
+    for i, holding in enumerate(holdings):
+        position = {
+            'symbol': holding.symbol,
+            'quantity': holding.quantity,
+            'average_price': holding.average_price,
+            'price': _json_number(price[i]),
+            'source': quotes[symbols[i]].get('source')
+        }
+        for name, values in columns.items():
+            position[name] = _json_number(values[i])
+        positions.append(position)
+
+    return jsonify({
+        'positions': positions,
+        'totals': {name: _json_number(value) if value is not None else None for name, value in totals.items()}
+    }), 200
+
+TRANSACTIONS_DEFAULT_LIMIT = 20
+TRANSACTIONS_MAX_LIMIT = 100
+
+def encode_cursor(tx):
+    raw = f'{tx.timestamp.isoformat()}|{tx.id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    timestamp, tx_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(timestamp), int(tx_id)
+
 @stocks_bp.route('/transactions', methods=['GET'])
 @jwt_required()
 def get_transactions():
+    """Get the user's transactions, newest first.
+
+    Pages are keyed on (timestamp, id): pass the X-Next-Cursor header of one
+    response as ?cursor= to get the next page. Optional filters: symbol,
+    type (BUY/SELL), start and end (ISO dates), limit (max 100).
+    """
     current_user_id = get_jwt_identity()
-    
-    transactions = Transaction.query.filter_by(user_id=current_user_id).order_by(Transaction.timestamp.desc()).limit(20).all()
-    
+
+    try:
+        limit = min(int(request.args.get('limit', TRANSACTIONS_DEFAULT_LIMIT)), TRANSACTIONS_MAX_LIMIT)
+        if limit <= 0:
+            raise ValueError('limit must be positive')
+
+        query = Transaction.query.filter(Transaction.user_id == current_user_id)
+
+        if request.args.get('symbol'):
+            query = query.filter(Transaction.symbol == request.args['symbol'].upper())
+        if request.args.get('type'):
+            query = query.filter(Transaction.transaction_type == request.args['type'].upper())
+        if request.args.get('start'):
+            query = query.filter(Transaction.timestamp >= datetime.fromisoformat(request.args['start']))
+        if request.args.get('end'):
+            query = query.filter(Transaction.timestamp < datetime.fromisoformat(request.args['end']))
+        if request.args.get('cursor'):
+            query = query.filter(tuple_(Transaction.timestamp, Transaction.id) < decode_cursor(request.args['cursor']))
+    except (ValueError, binascii.Error) as e:
+        return jsonify({'error': f'Invalid query parameter: {str(e)}'}), 400
+
+    # Fetch one extra row to learn whether another page exists
+    transactions = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+
     response = []
     for tx in transactions:
         response.append({
@@ -196,136 +322,192 @@ def get_transactions():
             'price': tx.price,
             'timestamp': tx.timestamp.isoformat()
         })
-    
-    return jsonify(response), 200
+
+    response = jsonify(response)
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_cursor(transactions[-1])
+    return response, 200
 
 @stocks_bp.route('/buy', methods=['POST'])
 @jwt_required()
 def buy_stock():
+    return place_order('BUY', 'Stock purchased successfully')
+
+@stocks_bp.route('/sell', methods=['POST'])
+@jwt_required()
+def sell_stock():
+    return place_order('SELL', 'Stock sold successfully')
+
+def place_order(transaction_type, message):
     current_user_id = get_jwt_identity()
     data = request.get_json()
-    
-    if not all(k in data for k in ['symbol', 'quantity', 'price']):
-        return jsonify({'error': 'Missing required fields'}), 400
-    
+
     try:
-        # Create transaction record
-        transaction = Transaction(
-            user_id=current_user_id,
-            symbol=data['symbol'],
-            transaction_type='BUY',
-            quantity=data['quantity'],
-            price=data['price']
-        )
-        
-        # Update or create holding
-        holding = StockHolding.query.filter_by(
-            user_id=current_user_id,
-            symbol=data['symbol']
-        ).first()
-        
-        if holding:
-            # Calculate new average price
-            total_value = (holding.quantity * holding.average_price) + (data['quantity'] * data['price'])
-            new_quantity = holding.quantity + data['quantity']
-            new_average_price = total_value / new_quantity
-            
-            holding.quantity = new_quantity
-            holding.average_price = new_average_price
-        else:
-            holding = StockHolding(
-                user_id=current_user_id,
-                symbol=data['symbol'],
-                quantity=data['quantity'],
-                average_price=data['price']
-            )
-            db.session.add(holding)
-        
-        db.session.add(transaction)
+        order = parse_order(data, transaction_type)
+        transaction = execute_order(current_user_id, *order)
         db.session.commit()
-        
+
         return jsonify({
-            'message': 'Stock purchased successfully',
+            'message': message,
             'transaction_id': transaction.id
         }), 201
-        
+
+    except TradeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@stocks_bp.route('/sell', methods=['POST'])
+@stocks_bp.route('/orders', methods=['POST'])
 @jwt_required()
-def sell_stock():
+def submit_orders():
+    """Apply a list of buy/sell orders in a single transaction (all or nothing)"""
     current_user_id = get_jwt_identity()
-    data = request.get_json()
-    
-    if not all(k in data for k in ['symbol', 'quantity', 'price']):
-        return jsonify({'error': 'Missing required fields'}), 400
-    
+    data = request.get_json() or {}
+    orders = data.get('orders')
+
+    if not isinstance(orders, list) or not orders:
+        return jsonify({'error': 'orders must be a non-empty list'}), 400
+
+    if len(orders) > MAX_ORDERS_PER_REQUEST:
+        return jsonify({'error': f'At most {MAX_ORDERS_PER_REQUEST} orders per request'}), 400
+
+    index = 0
     try:
-        # Check if user has enough shares
-        holding = StockHolding.query.filter_by(
-            user_id=current_user_id,
-            symbol=data['symbol']
-        ).first()
-        
-        if not holding or holding.quantity < data['quantity']:
-            return jsonify({'error': 'Not enough shares to sell'}), 400
-        
-        # Create transaction record
-        transaction = Transaction(
-            user_id=current_user_id,
-            symbol=data['symbol'],
-            transaction_type='SELL',
-            quantity=data['quantity'],
-            price=data['price']
-        )
-        
-        # Update holding
-        new_quantity = holding.quantity - data['quantity']
-        if new_quantity > 0:
-            holding.quantity = new_quantity
-        else:
-            db.session.delete(holding)
-        
-        db.session.add(transaction)
+        transactions = []
+        for index, order in enumerate(orders):
+            transactions.append(execute_order(current_user_id, *parse_order(order)))
         db.session.commit()
-        
+
         return jsonify({
-            'message': 'Stock sold successfully',
-            'transaction_id': transaction.id
+            'message': f'{len(transactions)} orders executed successfully',
+            'transaction_ids': [tx.id for tx in transactions]
         }), 201
-        
+
+    except TradeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'order_index': index}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'order_index': index}), 500
+
+IMPORT_DELIMITERS = {',': ',', ';': ';', 'tab': '\t', '|': '|'}
+
+@stocks_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_transactions():
+    """Import trades from an uploaded CSV (or other delimited) file.
+
+    Expected columns: symbol, transaction_type (BUY/SELL), quantity, price,
+    and optionally fee and timestamp. Rows are applied in file order.
+    """
+    current_user_id = get_jwt_identity()
+
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+
+    delimiter = IMPORT_DELIMITERS.get(request.form.get('delimiter', ','))
+    if delimiter is None:
+        return jsonify({'error': 'Unsupported delimiter'}), 400
+
+    try:
+        report = import_trades(current_user_id, iter_trade_rows(file.stream, delimiter))
+        db.session.commit()
+        return jsonify(report), 201
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def serialize_ledger(ledger):
+    return {
+        'symbol': ledger.symbol,
+        'quantity': ledger.quantity,
+        'cost_basis': ledger.cost_basis,
+        'average_cost': ledger.cost_basis / ledger.quantity if ledger.quantity else None,
+        'realized_pnl': ledger.realized_pnl,
+        'fees': ledger.fees,
+        'total_bought': ledger.total_bought,
+        'total_sold': ledger.total_sold,
+        'trade_count': ledger.trade_count,
+        'last_updated': ledger.last_updated.isoformat() if ledger.last_updated else None
+    }
+
+@stocks_bp.route('/pnl', methods=['GET'])
+@jwt_required()
+def get_realized_pnl():
+    """Get realized P&L, fees and open cost basis for every symbol the user traded"""
+    current_user_id = get_jwt_identity()
+
+    ledgers = PositionLedger.query.filter_by(user_id=current_user_id).order_by(PositionLedger.symbol).all()
+    positions = [serialize_ledger(ledger) for ledger in ledgers]
+
+    return jsonify({
+        'positions': positions,
+        'totals': {
+            'realized_pnl': sum(p['realized_pnl'] for p in positions),
+            'fees': sum(p['fees'] for p in positions),
+            'cost_basis': sum(p['cost_basis'] for p in positions)
+        }
+    }), 200
+
+@stocks_bp.route('/pnl/<symbol>', methods=['GET'])
+@jwt_required()
+def get_symbol_pnl(symbol):
+    """Get the ledger entry for a single symbol"""
+    current_user_id = get_jwt_identity()
+
+    ledger = PositionLedger.query.filter_by(user_id=current_user_id, symbol=symbol.upper()).first()
+    if not ledger:
+        return jsonify({'error': 'No trades recorded for this symbol'}), 404
+
+    return jsonify(serialize_ledger(ledger)), 200
+
 @stocks_bp.route('/history/<symbol>', methods=['GET'])
 @jwt_required()
 def get_stock_history(symbol):
     try:
-        url = f'https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}'
-        response = requests.get(url)
-        data = response.json()
-        
-        if 'Time Series (Daily)' not in data:
-            return jsonify({'error': 'Historical data not found'}), 404
-            
-        time_series = data['Time Series (Daily)']
-        
-        # Format data for frontend chart
-        dates = []
-        prices = []
-        
-        for date, values in sorted(time_series.items())[:30]:  # Limit to 30 days
-            dates.append(date)
-            prices.append(float(values['4. close']))
-        
-        return jsonify({
-            'symbol': symbol,
-            'dates': dates,
-            'prices': prices
-        }), 200
-        
+        bars = get_daily_bars(symbol)
+    except LookupError:
+        return jsonify({'error': 'Historical data not found'}), 404
+    except UpstreamError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    if not len(bars):
+        return jsonify({'error': 'Historical data not found'}), 404
+
+    # Format the most recent 30 days for the frontend chart
+    recent = bars[-30:]
+
+    return jsonify({
+        'symbol': symbol,
+        'dates': np.datetime_as_string(recent['date']).tolist(),
+        'prices': recent['close'].tolist()
+    }), 200
+
+@stocks_bp.route('/intraday/<symbol>', methods=['GET'])
+@jwt_required()
+def get_stock_intraday(symbol):
+    interval = request.args.get('interval', 5, type=int)
+    if interval not in INTRADAY_INTERVALS:
+        return jsonify({'error': f'interval must be one of {list(INTRADAY_INTERVALS)}'}), 400
+
+    try:
+        series, cache_status = get_intraday(symbol, interval)
+    except LookupError:
+        return jsonify({'error': 'Intraday data not found'}), 404
+    except UpstreamError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+    response = jsonify({'symbol': symbol.upper(), 'interval': interval, **series})
+    response.headers['X-Cache'] = cache_status.upper()
+    return response, 200
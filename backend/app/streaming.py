@@ -0,0 +1,165 @@
+from flask import Response
+from .concurrency import with_app_context
+import os
+import re
+import json
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Pause between words when mock clients stream, so offline streams look like real ones
+MOCK_STREAM_DELAY = float(os.getenv('MOCK_STREAM_DELAY', '0.02'))
+
+
+def format_sse(data, event=None):
+    """Format one Server-Sent Events message"""
+    message = ''
+    if event:
+        message += f'event: {event}\n'
+    payload = data if isinstance(data, str) else json.dumps(data)
+    for line in payload.splitlines() or ['']:
+        message += f'data: {line}\n'
+    return message + '\n'
+
+
+def sse_response(events):
+    """Wrap an iterable of formatted SSE messages in an unbuffered streaming response"""
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def iter_words(text, delay=MOCK_STREAM_DELAY):
+    """Yield text a word at a time (with its leading whitespace), like a token stream"""
+    for match in re.finditer(r'\s*\S+', text):
+        yield match.group(0)
+        if delay:
+            time.sleep(delay)
+
+
+def iter_completion_deltas(stream):
+    """Yield the text of each chunk from a streamed Groq SDK completion"""
+    for chunk in stream:
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+def iter_sse_deltas(response):
+    """Yield the text of each chunk from a raw streamed chat completion response"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            break
+        choices = json.loads(payload).get('choices') or []
+        if choices:
+            delta = (choices[0].get('delta') or {}).get('content')
+            if delta:
+                yield delta
+
+
+class Subscription:
+    """A client's queue of (symbol, quote) updates"""
+
+    def __init__(self, symbols, maxsize=100):
+        self.symbols = symbols
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, item):
+        # A slow client loses its oldest update rather than blocking the poller
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class QuoteHub:
+    """Runs one poller per subscribed symbol and fans its updates out to every subscriber.
+
+    Upstream load depends on the number of distinct symbols, not the number
+    of open connections. A poller exits once its symbol has no subscribers.
+    """
+
+    def __init__(self, fetch, interval):
+        self.fetch = fetch
+        self.interval = interval
+        self._subscribers = {}
+        self._pollers = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, symbols):
+        subscription = Subscription(symbols)
+        with self._lock:
+            for symbol in symbols:
+                self._subscribers.setdefault(symbol, set()).add(subscription)
+                if symbol in self._latest:
+                    subscription.put((symbol, self._latest[symbol]))
+                if symbol not in self._pollers:
+                    stop = threading.Event()
+                    thread = threading.Thread(
+                        target=with_app_context(self._poll),
+                        args=(symbol, stop),
+                        daemon=True
+                    )
+                    self._pollers[symbol] = stop
+                    thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for symbol in subscription.symbols:
+                subscribers = self._subscribers.get(symbol)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[symbol]
+                    self._latest.pop(symbol, None)
+                    stop = self._pollers.pop(symbol, None)
+                    if stop is not None:
+                        stop.set()
+
+    def _poll(self, symbol, stop):
+        while not stop.is_set():
+            try:
+                quote = self.fetch(symbol)
+            except Exception as e:
+                logger.error(f"Quote stream poll for {symbol} failed: {str(e)}")
+                quote = None
+
+            if quote is not None:
+                with self._lock:
+                    if stop.is_set():
+                        return
+                    changed = self._latest.get(symbol) != quote
+                    self._latest[symbol] = quote
+                    subscribers = list(self._subscribers.get(symbol, ()))
+                if changed:
+                    for subscription in subscribers:
+                        subscription.put((symbol, quote))
+
+            stop.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'symbols': len(self._pollers),
+                'subscriptions': len({s for subs in self._subscribers.values() for s in subs}),
+                'interval': self.interval
+            }
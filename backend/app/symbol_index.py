@@ -0,0 +1,195 @@
+from .concurrency import with_app_context
+from .upstream import upstream
+from bisect import bisect_left
+import io
+import os
+import csv
+import math
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_UNIVERSE_PATH = os.getenv(
+    'SYMBOL_UNIVERSE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'listing_status.csv')
+)
+SYMBOL_UNIVERSE_REFRESH = float(os.getenv('SYMBOL_UNIVERSE_REFRESH', '86400'))
+
+# Fuzzy name matches need at least this share of the query's trigrams
+MIN_NAME_SCORE = 0.5
+# Only the shortest names on each trigram's posting list are considered, bounding query time
+MAX_POSTINGS = int(os.getenv('SYMBOL_INDEX_MAX_POSTINGS', '256'))
+# Names that start with the query rank above equally similar names that don't
+NAME_PREFIX_BONUS = 0.5
+# Wait this long before retrying a failed or skipped listing download
+REFRESH_RETRY_SECONDS = 300
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _trigrams(text):
+    text = ' ' + _normalize(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SymbolIndex:
+    """In-memory ticker prefix index plus a trigram index over company names"""
+
+    def __init__(self, records):
+        # records: (symbol, name, exchange, asset_type), kept sorted by symbol for prefix search
+        self.records = sorted(records, key=lambda record: record[0])
+        self.tickers = [record[0] for record in self.records]
+        self.names = [_normalize(record[1]) for record in self.records]
+        self.name_grams = [_trigrams(name) for name in self.names]
+        postings = {}
+        for i, grams in enumerate(self.name_grams):
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        # Shortest names first, so truncated posting lists keep the closest matches
+        self.ngrams = {
+            gram: sorted(ids, key=lambda i: len(self.names[i]))[:MAX_POSTINGS]
+            for gram, ids in postings.items()
+        }
+        self.gram_counts = {gram: len(ids) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def search(self, query, limit=10):
+        """Return up to limit (record, score) pairs, best first"""
+        ticker = query.strip().upper()
+        if not ticker:
+            return []
+        scores = {}
+
+        # Ticker prefix matches rank above name matches, exact ticker first
+        start = bisect_left(self.tickers, ticker)
+        for i in range(start, len(self.tickers)):
+            if not self.tickers[i].startswith(ticker):
+                break
+            scores[i] = 3.0 if self.tickers[i] == ticker else 2.0 - len(self.tickers[i]) / 100
+            if len(scores) >= limit * 4:
+                break
+
+        # Company names share most of the query's trigrams. A name holding at least
+        # `needed` of them must hold one of the len(grams) - needed + 1 rarest ones,
+        # so only those posting lists are walked.
+        grams = _trigrams(query)
+        if grams:
+            needed = max(1, math.ceil(len(grams) * MIN_NAME_SCORE))
+            rarest = sorted(grams, key=lambda gram: self.gram_counts.get(gram, 0))[:len(grams) - needed + 1]
+            candidates = set()
+            for gram in rarest:
+                candidates.update(self.ngrams.get(gram, ()))
+
+            name = _normalize(query)
+            for i in candidates:
+                name_grams = self.name_grams[i]
+                matched = len(grams & name_grams)
+                if matched < needed:
+                    continue
+                # Jaccard similarity, so long names that merely contain the query rank lower
+                score = matched / (len(grams) + len(name_grams) - matched)
+                if self.names[i].startswith(name):
+                    score += NAME_PREFIX_BONUS
+                if score > scores.get(i, 0):
+                    scores[i] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self.tickers[item[0]])))
+        return [(self.records[i], round(score, 4)) for i, score in ranked[:limit]]
+
+
+def parse_listing(text_stream):
+    """Read active listings from an Alpha Vantage LISTING_STATUS CSV"""
+    records = []
+    for row in csv.DictReader(text_stream):
+        if row.get('status', 'Active') != 'Active' or not row.get('symbol'):
+            continue
+        records.append((row['symbol'].upper(), row.get('name') or '', row.get('exchange') or '', row.get('assetType') or ''))
+    return records
+
+
+class SymbolUniverse:
+    """Holds the current SymbolIndex and refreshes the listing file in the background"""
+
+    def __init__(self, path, refresh_interval):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self.loaded_at = 0.0
+        self._last_attempt = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _load_file(self):
+        with open(self.path, newline='', encoding='utf-8') as f:
+            self.index = SymbolIndex(parse_listing(f))
+        self.loaded_at = os.path.getmtime(self.path)
+
+    def _download(self):
+        api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+        if not api_key:
+            return
+
+        response = upstream.get('alphavantage', 'https://www.alphavantage.co/query', params={
+            'function': 'LISTING_STATUS',
+            'apikey': api_key
+        })
+        response.raise_for_status()
+
+        records = parse_listing(io.StringIO(response.text))
+        if not records:
+            raise ValueError('Listing download returned no symbols')
+
+        # Write to a temp file first so readers never see a half-written listing
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        os.replace(tmp_path, self.path)
+
+        self.index = SymbolIndex(records)
+        self.loaded_at = time.time()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.time() - self._last_attempt < REFRESH_RETRY_SECONDS:
+                return
+            self._refreshing = True
+            self._last_attempt = time.time()
+
+        def refresh():
+            try:
+                self._download()
+                logger.info(f"Symbol universe refreshed: {len(self.index or ())} symbols")
+            except Exception as e:
+                logger.warning(f"Symbol universe refresh failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=with_app_context(refresh), daemon=True).start()
+
+    def search(self, query, limit=10):
+        """Search the local universe; returns [] while no listing is available"""
+        if self.index is None and os.path.exists(self.path):
+            with self._lock:
+                if self.index is None:
+                    try:
+                        self._load_file()
+                    except (OSError, csv.Error) as e:
+                        logger.warning(f"Could not load symbol universe: {str(e)}")
+
+        if time.time() - self.loaded_at >= self.refresh_interval:
+            self._refresh_in_background()
+
+        if self.index is None:
+            return []
+        return self.index.search(query, limit)
+
+
+symbol_universe = SymbolUniverse(SYMBOL_UNIVERSE_PATH, SYMBOL_UNIVERSE_REFRESH)
@@ -0,0 +1,157 @@
+from .ohlcv_store import BAR_DTYPE, INTRADAY_DTYPE
+from .upstream import UpstreamError
+from datetime import date
+import time
+import zlib
+import random
+import numpy as np
+
+# Every path starts here, so a symbol's history is identical whenever it's generated
+SYNTHETIC_EPOCH = np.datetime64('2010-01-04', 'D')
+TRADING_DAYS = 252
+INTRADAY_OPEN_MINUTES = 9 * 60 + 30
+INTRADAY_SESSION_MINUTES = 390
+
+# Independent random streams per symbol
+_PARAMS, _RETURNS, _OHLC, _VOLUME, _INTRADAY = range(5)
+
+
+class SyntheticProviderError(UpstreamError):
+    """Injected failure from the synthetic provider"""
+
+
+class SyntheticMarketData:
+    """Deterministic market data generated from a geometric Brownian motion per symbol.
+
+    The same seed and symbol always produce the same price path. Latency and
+    error injection use a separate, unseeded generator so they never change
+    the data itself.
+    """
+
+    def __init__(self, seed=42, latency_ms=0.0, latency_jitter_ms=0.0, error_rate=0.0):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+
+    def _rng(self, symbol, stream, *extra):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode('utf-8')), stream, *extra])
+
+    def _simulate_upstream(self):
+        if self.latency_ms or self.latency_jitter_ms:
+            delay = self.latency_ms + random.uniform(0, self.latency_jitter_ms)
+            time.sleep(delay / 1000.0)
+        if self.error_rate and random.random() < self.error_rate:
+            raise SyntheticProviderError('Injected synthetic provider error')
+
+    def parameters(self, symbol):
+        """Return (start_price, annual_drift, annual_volatility, average_volume) for symbol"""
+        rng = self._rng(symbol, _PARAMS)
+        start_price = float(np.exp(rng.uniform(np.log(10), np.log(500))))
+        drift = float(rng.normal(0.07, 0.05))
+        volatility = float(rng.uniform(0.15, 0.45))
+        volume = float(np.exp(rng.uniform(np.log(2e5), np.log(5e7))))
+        return start_price, drift, volatility, volume
+
+    def _trading_days(self, end):
+        days = np.arange(SYNTHETIC_EPOCH, end + 1, dtype='datetime64[D]')
+        return days[np.is_busday(days)]
+
+    def _last_session(self, end=None):
+        end = np.datetime64(end or date.today(), 'D')
+        return np.busday_offset(end, 0, roll='backward')
+
+    def _generate_daily(self, symbol, end):
+        dates = self._trading_days(end)
+        n = len(dates)
+        start_price, drift, volatility, volume = self.parameters(symbol)
+        dt = 1.0 / TRADING_DAYS
+
+        # Draws are prefix-stable, so extending the end date never rewrites history
+        shocks = self._rng(symbol, _RETURNS).standard_normal(n)
+        log_returns = (drift - 0.5 * volatility ** 2) * dt + volatility * np.sqrt(dt) * shocks
+        close = start_price * np.exp(np.cumsum(log_returns))
+
+        noise = self._rng(symbol, _OHLC).standard_normal((n, 3)) * volatility * np.sqrt(dt)
+        previous_close = np.concatenate(([start_price], close[:-1]))
+        open_ = previous_close * np.exp(noise[:, 0] * 0.5)
+        high = np.maximum(open_, close) * np.exp(np.abs(noise[:, 1]))
+        low = np.minimum(open_, close) * np.exp(-np.abs(noise[:, 2]))
+
+        volumes = volume * self._rng(symbol, _VOLUME).lognormal(0.0, 0.35, n)
+
+        bars = np.empty(n, dtype=BAR_DTYPE)
+        bars['date'] = dates
+        bars['open'] = np.round(open_, 4)
+        bars['high'] = np.round(high, 4)
+        bars['low'] = np.round(low, 4)
+        bars['close'] = np.round(close, 4)
+        bars['volume'] = np.round(volumes)
+        return bars
+
+    def daily(self, symbol, days=None, end=None):
+        """Return daily bars up to the last session on or before end, oldest first"""
+        self._simulate_upstream()
+        bars = self._generate_daily(symbol.upper(), self._last_session(end))
+        return bars[-days:] if days else bars
+
+    def daily_panel(self, symbols, days, end=None):
+        """Return (dates, closes) with closes shaped (len(symbols), days)"""
+        end = self._last_session(end)
+        closes = np.empty((len(symbols), days))
+        dates = None
+        for i, symbol in enumerate(symbols):
+            bars = self._generate_daily(symbol.upper(), end)[-days:]
+            closes[i] = bars['close']
+            dates = bars['date']
+        return dates, closes
+
+    def quote(self, symbol, end=None):
+        """Return a quote dict shaped like the live providers' quotes"""
+        self._simulate_upstream()
+        symbol = symbol.upper()
+        last, previous = self._generate_daily(symbol, self._last_session(end))[-2:][::-1]
+        change = float(last['close'] - previous['close'])
+        return {
+            'symbol': symbol,
+            'price': float(last['close']),
+            'change': round(change, 4),
+            'change_percent': round(change / float(previous['close']) * 100, 4),
+            'high': float(last['high']),
+            'low': float(last['low']),
+            'volume': int(last['volume']),
+            'latest_trading_day': str(last['date']),
+            'source': 'Synthetic'
+        }
+
+    def intraday(self, symbol, interval_minutes=5, day=None):
+        """Return intraday bars for one session that open and close on its daily bar"""
+        self._simulate_upstream()
+        symbol = symbol.upper()
+        day = self._last_session(day)
+        bar = self._generate_daily(symbol, day)[-1]
+        _, _, volatility, _ = self.parameters(symbol)
+
+        steps = INTRADAY_SESSION_MINUTES // interval_minutes
+        rng = self._rng(symbol, _INTRADAY, int(day.astype('int64')), interval_minutes)
+        step_sigma = volatility * np.sqrt(interval_minutes / (INTRADAY_SESSION_MINUTES * TRADING_DAYS))
+
+        # Brownian bridge in log space from the day's open to its close
+        walk = np.concatenate(([0.0], np.cumsum(rng.standard_normal(steps) * step_sigma)))
+        t = np.linspace(0.0, 1.0, steps + 1)
+        target = np.log(bar['close'] / bar['open'])
+        path = bar['open'] * np.exp(walk - t * (walk[-1] - target))
+
+        open_ = path[:-1]
+        close = path[1:]
+        wiggle = np.abs(rng.standard_normal((steps, 2))) * step_sigma * 0.5
+        minutes = INTRADAY_OPEN_MINUTES + interval_minutes * np.arange(1, steps + 1)
+
+        bars = np.empty(steps, dtype=INTRADAY_DTYPE)
+        bars['timestamp'] = day.astype('datetime64[m]') + minutes.astype('timedelta64[m]')
+        bars['open'] = np.round(open_, 4)
+        bars['high'] = np.round(np.maximum(open_, close) * np.exp(wiggle[:, 0]), 4)
+        bars['low'] = np.round(np.minimum(open_, close) * np.exp(-wiggle[:, 1]), 4)
+        bars['close'] = np.round(close, 4)
+        bars['volume'] = np.round(bar['volume'] * rng.dirichlet(np.ones(steps)))
+        return bars
@@ -0,0 +1,192 @@
+from sqlalchemy import insert
+from .models import StockHolding, Transaction, PositionLedger, db
+from .trading import parse_order, TradeError
+from datetime import datetime
+import io
+import csv
+import time
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+# Accept the column names most broker exports use
+COLUMN_ALIASES = {
+    'type': 'transaction_type',
+    'side': 'transaction_type',
+    'action': 'transaction_type',
+    'ticker': 'symbol',
+    'qty': 'quantity',
+    'shares': 'quantity',
+    'commission': 'fee',
+    'fees': 'fee',
+    'date': 'timestamp',
+    'time': 'timestamp',
+    'datetime': 'timestamp'
+}
+
+
+def iter_trade_rows(stream, delimiter=','):
+    """Yield (line_number, row) pairs from a delimited byte stream without reading it all"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text, delimiter=delimiter)
+
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [COLUMN_ALIASES.get(name.strip().lower(), name.strip().lower()) for name in header]
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, dict(zip(columns, (cell.strip() for cell in row)))
+
+
+class _Position:
+    """In-memory holding and ledger state for one symbol while an import runs"""
+
+    def __init__(self, holding, ledger):
+        self.holding = holding
+        self.ledger = ledger
+        self.quantity = holding.quantity if holding else 0
+        self.average_price = holding.average_price if holding else 0.0
+
+        if ledger:
+            self.ledger_quantity = ledger.quantity
+            self.cost_basis = ledger.cost_basis
+            self.realized_pnl = ledger.realized_pnl
+            self.fees = ledger.fees
+            self.total_bought = ledger.total_bought
+            self.total_sold = ledger.total_sold
+            self.trade_count = ledger.trade_count
+        else:
+            self.ledger_quantity = self.quantity
+            self.cost_basis = self.quantity * self.average_price
+            self.realized_pnl = 0.0
+            self.fees = 0.0
+            self.total_bought = self.cost_basis
+            self.total_sold = 0.0
+            self.trade_count = 0
+
+    def buy(self, quantity, price, fee):
+        total_value = self.quantity * self.average_price + quantity * price
+        self.quantity += quantity
+        self.average_price = total_value / self.quantity
+
+        self.ledger_quantity += quantity
+        self.cost_basis += quantity * price + fee
+        self.fees += fee
+        self.total_bought += quantity * price
+        self.trade_count += 1
+
+    def sell(self, quantity, price, fee):
+        if quantity > self.quantity or quantity > self.ledger_quantity:
+            raise TradeError('Not enough shares to sell')
+
+        self.quantity -= quantity
+
+        sold_cost = quantity * self.cost_basis / self.ledger_quantity
+        self.realized_pnl += quantity * price - fee - sold_cost
+        self.cost_basis = 0.0 if quantity == self.ledger_quantity else self.cost_basis - sold_cost
+        self.ledger_quantity -= quantity
+        self.fees += fee
+        self.total_sold += quantity * price
+        self.trade_count += 1
+
+    def save(self, user_id, symbol):
+        now = datetime.utcnow()
+
+        if self.quantity > 0:
+            if self.holding is None:
+                self.holding = StockHolding(user_id=user_id, symbol=symbol)
+                db.session.add(self.holding)
+            self.holding.quantity = self.quantity
+            self.holding.average_price = self.average_price
+            self.holding.last_updated = now
+        elif self.holding is not None:
+            db.session.delete(self.holding)
+
+        if self.ledger is None:
+            self.ledger = PositionLedger(user_id=user_id, symbol=symbol)
+            db.session.add(self.ledger)
+        self.ledger.quantity = self.ledger_quantity
+        self.ledger.cost_basis = self.cost_basis
+        self.ledger.realized_pnl = self.realized_pnl
+        self.ledger.fees = self.fees
+        self.ledger.total_bought = self.total_bought
+        self.ledger.total_sold = self.total_sold
+        self.ledger.trade_count = self.trade_count
+        self.ledger.last_updated = now
+
+
+def import_trades(user_id, rows):
+    """Import (line_number, row) pairs in file order; the caller commits.
+
+    Valid rows are bulk-inserted as Transaction rows in batches of
+    IMPORT_BATCH_SIZE. Holdings and ledger entries are tracked in memory
+    and written once per symbol at the end. Invalid rows are skipped and
+    reported.
+    """
+    user_id = int(user_id)
+    started = time.perf_counter()
+
+    # Lock the user's current positions for the duration of the import
+    holdings = {
+        h.symbol: h for h in StockHolding.query.filter_by(user_id=user_id).with_for_update().all()
+    }
+    ledgers = {
+        l.symbol: l for l in PositionLedger.query.filter_by(user_id=user_id).with_for_update().all()
+    }
+
+    positions = {}
+    batch = []
+    imported = 0
+    error_count = 0
+    errors = []
+
+    def flush():
+        if batch:
+            db.session.execute(insert(Transaction), batch)
+            batch.clear()
+
+    for line_number, row in rows:
+        try:
+            symbol, transaction_type, quantity, price, fee = parse_order(row)
+            timestamp = datetime.fromisoformat(row['timestamp']) if row.get('timestamp') else datetime.utcnow()
+
+            position = positions.get(symbol) or _Position(holdings.get(symbol), ledgers.get(symbol))
+            if transaction_type == 'BUY':
+                position.buy(quantity, price, fee)
+            else:
+                position.sell(quantity, price, fee)
+            # Only symbols with an applied trade get written back, so rejected rows leave no ledger
+            positions[symbol] = position
+        except (TradeError, ValueError) as e:
+            error_count += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({'line': line_number, 'error': str(e)})
+            continue
+
+        batch.append({
+            'user_id': user_id,
+            'symbol': symbol,
+            'transaction_type': transaction_type,
+            'quantity': quantity,
+            'price': price,
+            'timestamp': timestamp
+        })
+        imported += 1
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush()
+
+    flush()
+
+    for symbol, position in positions.items():
+        position.save(user_id, symbol)
+
+    return {
+        'imported': imported,
+        'rejected': error_count,
+        'errors': errors,
+        'symbols': sorted(positions),
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
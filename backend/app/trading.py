@@ -0,0 +1,290 @@
+from sqlalchemy import update, delete, case, select, exists, func, or_
+from .models import StockHolding, Transaction, PositionLedger, db
+from datetime import datetime
+
+MAX_ORDERS_PER_REQUEST = 500
+
+
+class TradeError(ValueError):
+    """Raised when an order is invalid or can't be filled"""
+
+
+def parse_order(data, transaction_type=None):
+    """Validate an order payload and return (symbol, transaction_type, quantity, price, fee)"""
+    if not isinstance(data, dict) or not all(k in data for k in ['symbol', 'quantity', 'price']):
+        raise TradeError('Missing required fields')
+
+    transaction_type = (transaction_type or str(data.get('transaction_type', ''))).upper()
+    if transaction_type not in ('BUY', 'SELL'):
+        raise TradeError("transaction_type must be 'BUY' or 'SELL'")
+
+    symbol = str(data['symbol']).strip().upper()
+    if not symbol or len(symbol) > 10:
+        raise TradeError('Invalid symbol')
+
+    try:
+        quantity = int(data['quantity'])
+        price = float(data['price'])
+        fee = float(data.get('fee') or 0)
+    except (TypeError, ValueError):
+        raise TradeError('Quantity, price and fee must be numbers')
+
+    if quantity <= 0 or quantity != float(data['quantity']):
+        raise TradeError('Quantity must be a positive whole number')
+    if price <= 0:
+        raise TradeError('Price must be positive')
+    if fee < 0:
+        raise TradeError('Fee cannot be negative')
+
+    return symbol, transaction_type, quantity, price, fee
+
+
+def _holding_filter(user_id, symbol):
+    return (StockHolding.user_id == user_id, StockHolding.symbol == symbol)
+
+
+def _upsert_insert(dialect):
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def add_to_holding(user_id, symbol, quantity, price):
+    """Add shares to a holding and re-average its price in one atomic statement"""
+    now = datetime.utcnow()
+    insert = _upsert_insert(db.session.get_bind().dialect.name)
+
+    if insert is not None:
+        # INSERT ... ON CONFLICT DO UPDATE against the (user_id, symbol) unique index.
+        # SET expressions see the pre-update row, so concurrent buys can't lose updates.
+        stmt = insert(StockHolding).values(
+            user_id=user_id,
+            symbol=symbol,
+            quantity=quantity,
+            average_price=price,
+            last_updated=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'symbol'],
+            set_={
+                'average_price': (
+                    StockHolding.quantity * StockHolding.average_price
+                    + stmt.excluded.quantity * stmt.excluded.average_price
+                ) / (StockHolding.quantity + stmt.excluded.quantity),
+                'quantity': StockHolding.quantity + stmt.excluded.quantity,
+                'last_updated': now
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    # Other databases: lock the row for the rest of the transaction
+    holding = StockHolding.query.filter(*_holding_filter(user_id, symbol)).with_for_update().first()
+    if holding:
+        total_value = (holding.quantity * holding.average_price) + (quantity * price)
+        holding.quantity += quantity
+        holding.average_price = total_value / holding.quantity
+    else:
+        db.session.add(StockHolding(user_id=user_id, symbol=symbol, quantity=quantity, average_price=price))
+    db.session.flush()
+
+
+def remove_from_holding(user_id, symbol, quantity):
+    """Remove shares from a holding, refusing to oversell, in one atomic statement"""
+    result = db.session.execute(
+        update(StockHolding)
+        .where(*_holding_filter(user_id, symbol), StockHolding.quantity >= quantity)
+        .values(quantity=StockHolding.quantity - quantity, last_updated=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise TradeError('Not enough shares to sell')
+
+    db.session.execute(
+        delete(StockHolding)
+        .where(*_holding_filter(user_id, symbol), StockHolding.quantity <= 0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _ledger_filter(user_id, symbol):
+    return (PositionLedger.user_id == user_id, PositionLedger.symbol == symbol)
+
+
+def record_buy_in_ledger(user_id, symbol, quantity, price, fee=0.0):
+    """Add a buy to the position ledger; fees are capitalized into the cost basis"""
+    now = datetime.utcnow()
+    notional = quantity * price
+    insert = _upsert_insert(db.session.get_bind().dialect.name)
+
+    if insert is not None:
+        stmt = insert(PositionLedger).values(
+            user_id=user_id,
+            symbol=symbol,
+            quantity=quantity,
+            cost_basis=notional + fee,
+            realized_pnl=0.0,
+            fees=fee,
+            total_bought=notional,
+            total_sold=0.0,
+            trade_count=1,
+            last_updated=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'symbol'],
+            set_={
+                'quantity': PositionLedger.quantity + quantity,
+                'cost_basis': PositionLedger.cost_basis + notional + fee,
+                'fees': PositionLedger.fees + fee,
+                'total_bought': PositionLedger.total_bought + notional,
+                'trade_count': PositionLedger.trade_count + 1,
+                'last_updated': now
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    ledger = PositionLedger.query.filter(*_ledger_filter(user_id, symbol)).with_for_update().first()
+    if ledger is None:
+        ledger = PositionLedger(user_id=user_id, symbol=symbol, quantity=0, cost_basis=0.0,
+                                realized_pnl=0.0, fees=0.0, total_bought=0.0, total_sold=0.0, trade_count=0)
+        db.session.add(ledger)
+    ledger.quantity += quantity
+    ledger.cost_basis += notional + fee
+    ledger.fees += fee
+    ledger.total_bought += notional
+    ledger.trade_count += 1
+    db.session.flush()
+
+
+def record_sell_in_ledger(user_id, symbol, quantity, price, fee=0.0):
+    """Realize P&L for a sell against the average cost, in one atomic statement"""
+    proceeds = quantity * price
+    # Every SET expression reads the pre-update row, so this is the average cost before the sale
+    sold_cost = quantity * PositionLedger.cost_basis / PositionLedger.quantity
+
+    result = db.session.execute(
+        update(PositionLedger)
+        .where(*_ledger_filter(user_id, symbol), PositionLedger.quantity >= quantity)
+        .values(
+            realized_pnl=PositionLedger.realized_pnl + proceeds - fee - sold_cost,
+            cost_basis=case(
+                (PositionLedger.quantity == quantity, 0.0),
+                else_=PositionLedger.cost_basis - sold_cost
+            ),
+            quantity=PositionLedger.quantity - quantity,
+            fees=PositionLedger.fees + fee,
+            total_sold=PositionLedger.total_sold + proceeds,
+            trade_count=PositionLedger.trade_count + 1,
+            last_updated=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise TradeError(f'Position ledger for {symbol} is out of sync with holdings')
+
+
+def _merge_holding(keep, row):
+    quantity = keep.quantity + row.quantity
+    if quantity:
+        keep.average_price = (keep.quantity * keep.average_price + row.quantity * row.average_price) / quantity
+    keep.quantity = quantity
+
+
+def _merge_ledger(keep, row):
+    for field in ('quantity', 'cost_basis', 'realized_pnl', 'fees', 'total_bought', 'total_sold', 'trade_count'):
+        setattr(keep, field, getattr(keep, field) + getattr(row, field))
+
+
+def _normalize_rows(model, merge):
+    upper = func.upper(model.symbol)
+    groups = db.session.execute(
+        select(model.user_id, upper)
+        .group_by(model.user_id, upper)
+        .having(or_(func.count(model.id) > 1, func.max(case((model.symbol != upper, 1), else_=0)) == 1))
+    ).all()
+
+    for user_id, symbol in groups:
+        rows = model.query.filter(model.user_id == user_id, upper == symbol).order_by(model.id).all()
+        keep = rows[0]
+        for row in rows[1:]:
+            merge(keep, row)
+            db.session.delete(row)
+        # Remove the merged rows before renaming, so the unique index never sees two
+        db.session.flush()
+        keep.symbol = symbol
+        db.session.flush()
+    return len(groups)
+
+
+def normalize_symbols():
+    """Uppercase symbols stored before orders were normalized, merging rows that now collide.
+
+    Runs before the (user_id, symbol) unique indexes are created, so holdings
+    and ledgers saved as e.g. 'aapl' keep matching orders for 'AAPL'.
+    """
+    fixed = _normalize_rows(StockHolding, _merge_holding) + _normalize_rows(PositionLedger, _merge_ledger)
+    db.session.execute(
+        update(Transaction)
+        .where(Transaction.symbol != func.upper(Transaction.symbol))
+        .values(symbol=func.upper(Transaction.symbol))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return fixed
+
+
+def backfill_ledger():
+    """Open ledger rows for holdings that predate the ledger"""
+    missing = select(
+        StockHolding.user_id,
+        StockHolding.symbol,
+        StockHolding.quantity,
+        StockHolding.quantity * StockHolding.average_price
+    ).where(~exists().where(
+        PositionLedger.user_id == StockHolding.user_id,
+        PositionLedger.symbol == StockHolding.symbol
+    ))
+
+    rows = db.session.execute(missing).all()
+    for user_id, symbol, quantity, cost_basis in rows:
+        db.session.add(PositionLedger(
+            user_id=user_id,
+            symbol=symbol,
+            quantity=quantity,
+            cost_basis=cost_basis,
+            realized_pnl=0.0,
+            fees=0.0,
+            total_bought=cost_basis,
+            total_sold=0.0,
+            trade_count=0
+        ))
+    db.session.commit()
+    return len(rows)
+
+
+def execute_order(user_id, symbol, transaction_type, quantity, price, fee=0.0):
+    """Record a transaction and apply it to the holding and ledger; the caller commits"""
+    user_id = int(user_id)
+
+    if transaction_type == 'BUY':
+        add_to_holding(user_id, symbol, quantity, price)
+        record_buy_in_ledger(user_id, symbol, quantity, price, fee)
+    else:
+        remove_from_holding(user_id, symbol, quantity)
+        record_sell_in_ledger(user_id, symbol, quantity, price, fee)
+
+    transaction = Transaction(
+        user_id=user_id,
+        symbol=symbol,
+        transaction_type=transaction_type,
+        quantity=quantity,
+        price=price
+    )
+    db.session.add(transaction)
+    db.session.flush()
+    return transaction
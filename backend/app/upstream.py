@@ -0,0 +1,349 @@
+from requests.adapters import HTTPAdapter
+import os
+import time
+import random
+import logging
+import threading
+import requests
+import groq
+from collections import deque
+from .concurrency import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '10'))
+UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', '2'))
+UPSTREAM_BACKOFF = float(os.getenv('UPSTREAM_BACKOFF', '0.25'))
+# How long a caller may wait for a rate-limit token; 0 fails fast
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', '2'))
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', '20'))
+# Completions stream back far more data than the REST APIs, so they get their own timeout
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '60'))
+
+# Circuit breaker tuning, shared by every provider
+CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', '20'))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '5'))
+CIRCUIT_ERROR_THRESHOLD = float(os.getenv('CIRCUIT_ERROR_THRESHOLD', '0.5'))
+CIRCUIT_LATENCY_THRESHOLD = float(os.getenv('CIRCUIT_LATENCY_THRESHOLD', '5'))
+CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', '30'))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Requests per minute and burst size for each provider, sized to the free-tier quotas
+PROVIDERS = {
+    'alphavantage': {'per_minute': 5, 'burst': 5},
+    'finnhub': {'per_minute': 60, 'burst': 30},
+    'newsapi': {'per_minute': 10, 'burst': 5},
+    'groq': {'per_minute': 30, 'burst': 10}
+}
+
+
+class UpstreamError(Exception):
+    """Base class for upstream provider failures"""
+
+
+class RateLimitExceeded(UpstreamError):
+    """Raised when a provider's token bucket can't grant a request in time"""
+
+
+class QuotaExceeded(UpstreamError):
+    """Raised when a provider answers with a quota message instead of data"""
+
+
+class CircuitOpen(UpstreamError):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """Raised when a provider can't be reached after every retry"""
+
+
+class TokenBucket:
+    """Token bucket that refills at rate tokens per second up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=0):
+        """Take one token, waiting up to timeout seconds; returns False if none came"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return False
+            time.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """Tracks recent outcomes for a provider and opens when it looks unhealthy.
+
+    The breaker opens when the error rate or the p95 latency over the last
+    ``window`` calls crosses its threshold. After ``cooldown`` seconds a
+    single probe is let through; success closes the breaker, failure
+    reopens it.
+    """
+
+    def __init__(self, window, min_calls, error_threshold, latency_threshold, cooldown):
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Return True if a call would currently be let through"""
+        with self._lock:
+            if self.state == 'open':
+                return time.monotonic() - self._opened_at >= self.cooldown
+            if self.state == 'half_open':
+                return not self._probing
+            return True
+
+    def allow(self):
+        """Reserve a call; in the half-open state only one probe is allowed"""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def release(self):
+        """Give back a reserved call that never reached the provider"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok, latency):
+        with self._lock:
+            self._outcomes.append((ok, latency))
+
+            if self.state == 'half_open':
+                self._probing = False
+                if ok:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            if self.state == 'closed' and len(self._outcomes) >= self.min_calls:
+                errors = sum(1 for outcome_ok, _ in self._outcomes if not outcome_ok)
+                if errors / len(self._outcomes) >= self.error_threshold \
+                        or self._p95() > self.latency_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self._opened_at = time.monotonic()
+
+    def _p95(self):
+        latencies = sorted(latency for _, latency in self._outcomes)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def p95_latency(self):
+        with self._lock:
+            return self._p95()
+
+    def snapshot(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            errors = sum(1 for ok, _ in self._outcomes if not ok)
+            p95 = self._p95()
+            return {
+                'state': self.state,
+                'calls': calls,
+                'error_rate': round(errors / calls, 4) if calls else 0.0,
+                'p95_latency': round(p95, 4) if p95 is not None else None
+            }
+
+
+class UpstreamClient:
+    """Shared HTTP client with pooled sessions, timeouts, retries and rate limits per provider"""
+
+    def __init__(self, providers):
+        self.buckets = {}
+        self.breakers = {}
+        self._sessions = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.single_flight = SingleFlight()
+
+        for name, limits in providers.items():
+            env_prefix = name.upper()
+            per_minute = float(os.getenv(f'{env_prefix}_RATE_PER_MIN', limits['per_minute']))
+            burst = int(os.getenv(f'{env_prefix}_RATE_BURST', limits['burst']))
+            self.buckets[name] = TokenBucket(per_minute / 60.0, burst)
+            self.breakers[name] = CircuitBreaker(
+                CIRCUIT_WINDOW,
+                CIRCUIT_MIN_CALLS,
+                CIRCUIT_ERROR_THRESHOLD,
+                CIRCUIT_LATENCY_THRESHOLD,
+                CIRCUIT_COOLDOWN
+            )
+            self._counters[name] = {
+                'requests': 0,
+                'retries': 0,
+                'failures': 0,
+                'rate_limited': 0,
+                'short_circuited': 0
+            }
+
+    def _count(self, provider, counter):
+        with self._lock:
+            self._counters[provider][counter] += 1
+
+    def session(self, provider):
+        """Return the keep-alive session for provider"""
+        with self._lock:
+            session = self._sessions.get(provider)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[provider] = session
+            return session
+
+    def acquire(self, provider):
+        """Take a rate-limit token for provider or raise RateLimitExceeded"""
+        if not self.buckets[provider].acquire(UPSTREAM_QUEUE_TIMEOUT):
+            self._count(provider, 'rate_limited')
+            raise RateLimitExceeded(f'{provider} rate limit reached, try again shortly')
+
+    def _send(self, provider, method, url, **kwargs):
+        kwargs.setdefault('timeout', (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT))
+        session = self.session(provider)
+
+        # One token per logical request; retries of it don't spend the provider's quota again
+        self.acquire(provider)
+
+        for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+            if attempt:
+                self._count(provider, 'retries')
+                # Full jitter keeps retries from lining up across workers
+                time.sleep(random.uniform(0, UPSTREAM_BACKOFF * 2 ** attempt))
+
+            self._count(provider, 'requests')
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning(f"{provider} request failed (attempt {attempt + 1}): {str(e)}")
+                if attempt == UPSTREAM_MAX_RETRIES:
+                    raise UpstreamUnavailable(f'{provider} is unreachable, try again shortly') from e
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < UPSTREAM_MAX_RETRIES:
+                continue
+            return response
+
+    def _call(self, provider, method, url, decode, **kwargs):
+        breaker = self.breakers[provider]
+        if not breaker.allow():
+            self._count(provider, 'short_circuited')
+            raise CircuitOpen(f'{provider} is temporarily unavailable')
+
+        started = time.monotonic()
+        try:
+            response = self._send(provider, method, url, **kwargs)
+            ok = response.status_code not in RETRY_STATUSES
+            result = response
+            if decode:
+                result = response.json()
+                # Alpha Vantage answers 200 with a lone Note/Information field once the quota is used up
+                if provider == 'alphavantage' and isinstance(result, dict) and len(result) == 1 \
+                        and ('Note' in result or 'Information' in result):
+                    self._count(provider, 'rate_limited')
+                    raise QuotaExceeded(next(iter(result.values())))
+        except RateLimitExceeded:
+            # Our own limiter said no, which says nothing about the provider's health
+            breaker.release()
+            raise
+        except Exception:
+            self._count(provider, 'failures')
+            breaker.record(False, time.monotonic() - started)
+            raise
+
+        if not ok:
+            self._count(provider, 'failures')
+        breaker.record(ok, time.monotonic() - started)
+        return result
+
+    def request(self, provider, method, url, **kwargs):
+        return self._call(provider, method, url, False, **kwargs)
+
+    def get(self, provider, url, **kwargs):
+        return self.request(provider, 'GET', url, **kwargs)
+
+    def post(self, provider, url, **kwargs):
+        return self.request(provider, 'POST', url, **kwargs)
+
+    def get_json(self, provider, url, **kwargs):
+        """GET url and decode JSON, raising QuotaExceeded on Alpha Vantage quota notes.
+
+        Identical concurrent requests (same provider, url and params) share
+        one upstream call and its decoded result.
+        """
+        params = kwargs.get('params') or {}
+        key = (provider, url, tuple(sorted((k, str(v)) for k, v in params.items())))
+        return self.single_flight.do(key, lambda: self._call(provider, 'GET', url, True, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._counters.items()}
+        for name, bucket in self.buckets.items():
+            stats[name]['tokens_available'] = round(bucket.available(), 2)
+            stats[name]['per_minute'] = bucket.rate * 60
+            stats[name]['circuit'] = self.breakers[name].snapshot()
+        return stats
+
+
+upstream = UpstreamClient(PROVIDERS)
+
+_groq_clients = {}
+_groq_lock = threading.Lock()
+
+
+def get_groq_client(api_key):
+    """Return a shared Groq SDK client so completions reuse pooled connections"""
+    with _groq_lock:
+        client = _groq_clients.get(api_key)
+        if client is None:
+            client = groq.Client(
+                api_key=api_key,
+                timeout=GROQ_TIMEOUT,
+                max_retries=UPSTREAM_MAX_RETRIES
+            )
+            _groq_clients[api_key] = client
+        return client
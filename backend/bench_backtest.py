@@ -0,0 +1,35 @@
+"""Benchmark backtest parameter sweeps on a synthetic symbol x day panel.
+
+Needs no API keys or network; defaults to 500 symbols over ten years.
+"""
+import json
+import argparse
+
+from app.synthetic import SyntheticMarketData
+from app.backtest import sweep, STRATEGIES, BACKTEST_WORKERS
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FinAI backtest sweeps')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=2520)
+    parser.add_argument('--workers', type=int, default=BACKTEST_WORKERS)
+    parser.add_argument('--strategy', choices=list(STRATEGIES), action='append')
+    args = parser.parse_args()
+
+    symbols = [f'SYM{i:04d}' for i in range(args.symbols)]
+    _, closes = SyntheticMarketData().daily_panel(symbols, args.days)
+
+    report = {}
+    for strategy in args.strategy or list(STRATEGIES):
+        result = sweep(closes, strategy, workers=args.workers)
+        report[strategy] = {
+            'combinations': result['combinations'],
+            'seconds': result['seconds'],
+            'bars_per_second': result['bars_per_second'],
+            'best': result['results'][0]
+        }
+
+    print(json.dumps({'symbols': args.symbols, 'days': args.days, 'workers': args.workers, 'sweeps': report}, indent=2))
+
+if __name__ == '__main__':
+    main()
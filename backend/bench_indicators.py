@@ -0,0 +1,87 @@
+"""Benchmark indicator computation: per-symbol pandas vs. the vectorized panel.
+
+Uses the synthetic market data generator, so it needs no API keys or
+network. Also reports the largest difference from the pandas reference.
+"""
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from app.synthetic import SyntheticMarketData
+from app.indicators import core_indicators, panel_indicators, IndicatorState, PANEL_CHUNK_ROWS
+from app.routes.analysis import calculate_technical_indicators
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FinAI indicator computation')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=1000)
+    parser.add_argument('--chunk-rows', type=int, default=PANEL_CHUNK_ROWS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    symbols = [f'SYM{i:04d}' for i in range(args.symbols)]
+    dates, closes = SyntheticMarketData().daily_panel(symbols, args.days)
+    index = pd.to_datetime(dates)
+
+    def per_symbol_pandas():
+        return [calculate_technical_indicators(pd.DataFrame({'close': row}, index=index)) for row in closes]
+
+    def per_symbol_numpy():
+        return [core_indicators(row) for row in closes]
+
+    def panel():
+        return panel_indicators(closes, chunk_rows=args.chunk_rows)
+
+    def incremental():
+        states = [IndicatorState() for _ in symbols]
+        for state, row in zip(states, closes):
+            for close in row:
+                state.update(close)
+        return states
+
+    reference, pandas_seconds = timed(per_symbol_pandas, args.repeat)
+    _, numpy_seconds = timed(per_symbol_numpy, args.repeat)
+    panel_result, panel_seconds = timed(panel, args.repeat)
+    _, incremental_seconds = timed(incremental, 1)
+
+    max_error = {}
+    for name, values in panel_result.items():
+        expected = np.stack([df[name].to_numpy() for df in reference])
+        both = ~np.isnan(expected) & ~np.isnan(values)
+        max_error[name] = float(np.max(np.abs(values[both] - expected[both]))) if both.any() else 0.0
+
+    bars = args.symbols * args.days
+    report = {
+        'symbols': args.symbols,
+        'days': args.days,
+        'chunk_rows': args.chunk_rows,
+        'seconds': {
+            'per_symbol_pandas': round(pandas_seconds, 4),
+            'per_symbol_numpy': round(numpy_seconds, 4),
+            'panel': round(panel_seconds, 4),
+            'incremental_replay': round(incremental_seconds, 4)
+        },
+        'bars_per_second': {
+            'per_symbol_pandas': round(bars / pandas_seconds),
+            'per_symbol_numpy': round(bars / numpy_seconds),
+            'panel': round(bars / panel_seconds),
+            'incremental_replay': round(bars / incremental_seconds)
+        },
+        'panel_speedup_vs_pandas': round(pandas_seconds / panel_seconds, 1),
+        'max_abs_error_vs_reference': max_error
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
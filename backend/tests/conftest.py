@@ -0,0 +1,46 @@
+import os
+
+# Configure the app before it is imported: throwaway database, no background threads
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_WARMER_ENABLED'] = 'false'
+os.environ.pop('CACHE_DB_PATH', None)
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models import User
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(app, username='trader'):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def auth_headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+
+@pytest.fixture
+def headers(app):
+    return auth_headers(app, make_user(app))
@@ -0,0 +1,64 @@
+"""The vectorized, incremental and panel indicators must match the pandas reference."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.indicators import IndicatorState, core_indicators, panel_indicators
+from app.routes.analysis import calculate_technical_indicators
+from app.synthetic import SyntheticMarketData
+
+END = '2024-06-28'
+BARS = 300
+COLUMNS = ('SMA_20', 'SMA_50', 'RSI', 'MACD', 'Signal_Line', 'BB_middle', 'BB_upper', 'BB_lower')
+SYMBOLS = ['AAPL', 'MSFT', 'TEST']
+
+
+def reference(close):
+    df = calculate_technical_indicators(pd.DataFrame({'close': close}))
+    return {name: df[name].to_numpy(dtype='f8') for name in COLUMNS}
+
+
+def assert_matches(actual, expected):
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-8, equal_nan=True)
+
+
+@pytest.fixture(scope='module')
+def close():
+    return np.asarray(SyntheticMarketData(seed=7).daily('TEST', days=BARS, end=END)['close'], dtype='f8')
+
+
+@pytest.mark.parametrize('name', COLUMNS)
+def test_vectorized_matches_reference(close, name):
+    assert_matches(core_indicators(close)[name], reference(close)[name])
+
+
+def test_incremental_matches_reference(close):
+    expected = reference(close)
+    state = IndicatorState()
+    rows = [state.update(value) for value in close]
+
+    for name in COLUMNS:
+        actual = np.array([np.nan if row[name] is None else row[name] for row in rows], dtype='f8')
+        assert_matches(actual, expected[name])
+
+
+def test_panel_matches_reference():
+    _, closes = SyntheticMarketData(seed=7).daily_panel(SYMBOLS, BARS, end=END)
+    # Small chunks so the rows are split across several passes
+    panel = panel_indicators(closes, chunk_rows=2)
+
+    for row, close in enumerate(closes):
+        expected = reference(close)
+        for name in COLUMNS:
+            assert_matches(panel[name][row], expected[name])
+
+
+def test_panel_tail_keeps_latest_columns():
+    _, closes = SyntheticMarketData(seed=7).daily_panel(SYMBOLS, BARS, end=END)
+    full = panel_indicators(closes)
+    tail = panel_indicators(closes, tail=5)
+
+    for name in COLUMNS:
+        np.testing.assert_array_equal(tail[name], full[name][:, -5:])
@@ -0,0 +1,100 @@
+"""Startup migration of holdings and ledgers saved before symbols were uppercased."""
+import sqlite3
+
+import pytest
+
+from app import create_app
+from conftest import make_user, auth_headers
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """A database as an older release left it: no unique indexes, symbols stored as sent"""
+    path = tmp_path / 'legacy.db'
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+    user_id = make_user(create_app())
+
+    conn = sqlite3.connect(path)
+    conn.execute('DROP INDEX uq_stock_holding_user_symbol')
+    conn.execute('DROP INDEX uq_position_ledger_user_symbol')
+    conn.executemany(
+        'INSERT INTO stock_holding (user_id, symbol, quantity, average_price) VALUES (?, ?, ?, ?)',
+        [(user_id, 'aapl', 10, 100.0), (user_id, 'AAPL', 10, 200.0), (user_id, 'msft', 5, 300.0),
+         (user_id, 'nvda', 3, 50.0), (user_id, 'NVDA', 1, 70.0)]
+    )
+    conn.executemany(
+        'INSERT INTO position_ledger (user_id, symbol, quantity, cost_basis, realized_pnl, fees, '
+        'total_bought, total_sold, trade_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(user_id, 'nvda', 3, 150.0, 10.0, 1.0, 200.0, 60.0, 3), (user_id, 'NVDA', 1, 70.0, 5.0, 0.5, 70.0, 0.0, 1)]
+    )
+    conn.execute(
+        'INSERT INTO "transaction" (user_id, symbol, transaction_type, quantity, price, timestamp) '
+        "VALUES (?, 'msft', 'BUY', 5, 300.0, '2024-01-02 10:00:00')",
+        (user_id,)
+    )
+    conn.commit()
+    conn.close()
+    return path, user_id
+
+
+def test_startup_uppercases_and_merges_legacy_rows(legacy_db):
+    path, user_id = legacy_db
+    app = create_app()
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    holdings = {h['symbol']: h for h in client.get('/api/stocks/holdings', headers=headers).get_json()}
+    assert sorted(holdings) == ['AAPL', 'MSFT', 'NVDA']
+    assert holdings['AAPL']['quantity'] == 20
+    assert holdings['AAPL']['average_price'] == pytest.approx(150.0)
+    assert holdings['NVDA']['quantity'] == 4
+    assert holdings['NVDA']['average_price'] == pytest.approx(55.0)
+
+    positions = {p['symbol']: p for p in client.get('/api/stocks/pnl', headers=headers).get_json()['positions']}
+    assert sorted(positions) == ['AAPL', 'MSFT', 'NVDA']
+    # Backfilled from the merged holding
+    assert positions['AAPL']['quantity'] == 20
+    assert positions['AAPL']['cost_basis'] == pytest.approx(3000.0)
+    # Existing ledgers are summed
+    assert positions['NVDA']['quantity'] == 4
+    assert positions['NVDA']['cost_basis'] == pytest.approx(220.0)
+    assert positions['NVDA']['realized_pnl'] == pytest.approx(15.0)
+    assert positions['NVDA']['trade_count'] == 4
+
+    assert [tx['symbol'] for tx in client.get('/api/stocks/transactions', headers=headers).get_json()] == ['MSFT']
+
+    conn = sqlite3.connect(path)
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list('stock_holding')")}
+    indexes |= {row[1] for row in conn.execute("PRAGMA index_list('position_ledger')")}
+    conn.close()
+    assert {'uq_stock_holding_user_symbol', 'uq_position_ledger_user_symbol'} <= indexes
+
+
+def test_migrated_holdings_trade_normally(legacy_db):
+    _, user_id = legacy_db
+    app = create_app()
+    client = app.test_client()
+    headers = auth_headers(app, user_id)
+
+    response = client.post('/api/stocks/sell', headers=headers, json={'symbol': 'msft', 'quantity': 5, 'price': 320})
+    assert response.status_code == 201
+    response = client.post('/api/stocks/buy', headers=headers, json={'symbol': 'aapl', 'quantity': 20, 'price': 150})
+    assert response.status_code == 201
+
+    holdings = {h['symbol']: h for h in client.get('/api/stocks/holdings', headers=headers).get_json()}
+    assert sorted(holdings) == ['AAPL', 'NVDA']
+    assert holdings['AAPL']['quantity'] == 40
+
+    msft = client.get('/api/stocks/pnl/MSFT', headers=headers).get_json()
+    assert msft['quantity'] == 0
+    assert msft['realized_pnl'] == pytest.approx(5 * 320 - 5 * 300.0)
+
+
+def test_migration_is_idempotent(legacy_db):
+    _, user_id = legacy_db
+    create_app()
+    app = create_app()
+    headers = auth_headers(app, user_id)
+
+    holdings = app.test_client().get('/api/stocks/holdings', headers=headers).get_json()
+    assert sorted(h['symbol'] for h in holdings) == ['AAPL', 'MSFT', 'NVDA']
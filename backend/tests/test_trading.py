@@ -0,0 +1,83 @@
+"""Buy/sell, bulk orders and the realized P&L ledger through the stock routes."""
+import pytest
+
+
+def buy(client, headers, symbol, quantity, price, fee=0):
+    return client.post('/api/stocks/buy', headers=headers,
+                       json={'symbol': symbol, 'quantity': quantity, 'price': price, 'fee': fee})
+
+
+def sell(client, headers, symbol, quantity, price, fee=0):
+    return client.post('/api/stocks/sell', headers=headers,
+                       json={'symbol': symbol, 'quantity': quantity, 'price': price, 'fee': fee})
+
+
+def holdings(client, headers):
+    return {h['symbol']: h for h in client.get('/api/stocks/holdings', headers=headers).get_json()}
+
+
+def test_buys_merge_into_one_averaged_holding(client, headers):
+    assert buy(client, headers, 'AAPL', 10, 100).status_code == 201
+    assert buy(client, headers, 'aapl', 30, 200).status_code == 201
+
+    assert list(holdings(client, headers)) == ['AAPL']
+    holding = holdings(client, headers)['AAPL']
+    assert holding['quantity'] == 40
+    assert holding['average_price'] == pytest.approx(175.0)
+
+
+def test_selling_everything_removes_the_holding(client, headers):
+    buy(client, headers, 'MSFT', 5, 300)
+    assert sell(client, headers, 'MSFT', 5, 310).status_code == 201
+    assert holdings(client, headers) == {}
+
+
+def test_oversell_is_rejected_and_changes_nothing(client, headers):
+    buy(client, headers, 'AAPL', 10, 100)
+
+    response = sell(client, headers, 'AAPL', 11, 120)
+    assert response.status_code == 400
+    assert 'Not enough shares' in response.get_json()['error']
+
+    assert holdings(client, headers)['AAPL']['quantity'] == 10
+    ledger = client.get('/api/stocks/pnl/AAPL', headers=headers).get_json()
+    assert ledger['quantity'] == 10
+    assert ledger['trade_count'] == 1
+    assert ledger['realized_pnl'] == 0
+
+
+def test_selling_an_unheld_symbol_is_rejected(client, headers):
+    assert sell(client, headers, 'TSLA', 1, 100).status_code == 400
+    assert client.get('/api/stocks/pnl/TSLA', headers=headers).status_code == 404
+
+
+def test_failed_order_rolls_back_the_whole_batch(client, headers):
+    buy(client, headers, 'AAPL', 10, 100)
+
+    response = client.post('/api/stocks/orders', headers=headers, json={'orders': [
+        {'symbol': 'MSFT', 'transaction_type': 'BUY', 'quantity': 5, 'price': 300},
+        {'symbol': 'AAPL', 'transaction_type': 'SELL', 'quantity': 4, 'price': 110},
+        {'symbol': 'AAPL', 'transaction_type': 'SELL', 'quantity': 50, 'price': 110},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['order_index'] == 2
+
+    assert list(holdings(client, headers)) == ['AAPL']
+    assert holdings(client, headers)['AAPL']['quantity'] == 10
+    assert client.get('/api/stocks/pnl/MSFT', headers=headers).status_code == 404
+    assert len(client.get('/api/stocks/transactions', headers=headers).get_json()) == 1
+
+
+def test_partial_sell_realizes_pnl_against_average_cost(client, headers):
+    buy(client, headers, 'AAPL', 10, 100, fee=5)
+    buy(client, headers, 'AAPL', 10, 120, fee=5)
+    # Average cost including buy fees: (1000 + 5 + 1200 + 5) / 20 = 110.5
+    assert sell(client, headers, 'AAPL', 5, 130, fee=2).status_code == 201
+
+    ledger = client.get('/api/stocks/pnl/AAPL', headers=headers).get_json()
+    assert ledger['quantity'] == 15
+    assert ledger['realized_pnl'] == pytest.approx(5 * 130 - 2 - 5 * 110.5)
+    assert ledger['cost_basis'] == pytest.approx(15 * 110.5)
+    assert ledger['average_cost'] == pytest.approx(110.5)
+    assert ledger['fees'] == pytest.approx(12)
+    assert ledger['trade_count'] == 3
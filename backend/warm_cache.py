@@ -0,0 +1,37 @@
+"""Warm the quote and history caches from the command line.
+
+Runs the same cycle as the in-process scheduler. Point CACHE_DB_PATH at the
+file the web workers use so refreshed quotes are shared with them; daily
+history is always shared through the on-disk bar store.
+"""
+import os
+import json
+import argparse
+
+# This process does the warming itself, so don't also start the background thread
+os.environ['CACHE_WARMER_ENABLED'] = 'false'
+
+from app import create_app
+from app.cache_warmer import CacheWarmer, CACHE_WARMER_INTERVAL
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep FinAI quote and history caches warm')
+    parser.add_argument('--once', action='store_true', help='run a single cycle and exit')
+    parser.add_argument('--interval', type=float, default=CACHE_WARMER_INTERVAL, help='seconds between cycles')
+    args = parser.parse_args()
+
+    app = create_app()
+    warmer = CacheWarmer(app, interval=args.interval)
+
+    if args.once:
+        with app.app_context():
+            print(json.dumps(warmer.run_cycle(), indent=2))
+        return
+
+    try:
+        warmer.run_forever()
+    except KeyboardInterrupt:
+        warmer.stop()
+
+if __name__ == '__main__':
+    main()